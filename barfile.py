@@ -0,0 +1,152 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# On-disk format for price bars: fixed-width little-endian columns behind a
+# JSON header, so a reader can mmap the file and use the columns in place.
+#
+#   b"BARS" | uint32 version | uint64 header size | header JSON, padded to 8 bytes |
+#   int64 timestamps (epoch ns, UTC) | one "<f8" or "<i8" column after another
+#
+# The header holds the row count, the index name and time zone, the column
+# names and dtypes, and free-form metadata. Files are written under a
+# temporary name and renamed into place, so readers always see a complete
+# file, and a reader still mapping the old file keeps a consistent view of it.
+# Every process mapping the same file shares its pages through the page cache.
+MAGIC = b"BARS"
+VERSION = 1
+_PREFIX = struct.Struct("<4sIQ")
+
+
+class Bars:
+    """Price bars as an int64 timestamp column plus value columns, in memory or mapped from a file.
+
+    Timestamps are sorted, so time ranges are found by binary search, and
+    slices are views rather than copies.
+    """
+
+    def __init__(self, timestamps: np.ndarray, columns: dict, tz: str = None, index_name: str = "Date",
+                 meta: dict = None, source: tuple = None):
+        self.timestamps = timestamps
+        self.columns = columns
+        self.tz = tz
+        self.index_name = index_name
+        self.meta = meta or {}
+        # (inode, mtime) of the mapped file, to notice when another process replaces it
+        self.source = source
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, meta: dict = None) -> "Bars":
+        """Bars from a yfinance history frame indexed by a DatetimeIndex."""
+        index = frame.index
+        tz = str(index.tz) if index.tz is not None else None
+        if tz is not None:
+            index = index.tz_convert("UTC").tz_localize(None)
+        columns = {}
+        for name in frame.columns:
+            series = frame[name]
+            dtype = "<i8" if pd.api.types.is_integer_dtype(series) and not series.isna().any() else "<f8"
+            columns[str(name)] = pd.to_numeric(series, errors="coerce").to_numpy(dtype=dtype)
+        timestamps = index.to_numpy(dtype="datetime64[ns]").view("<i8")
+        return cls(timestamps, columns, tz, frame.index.name or "Date", meta)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + sum(column.nbytes for column in self.columns.values())
+
+    def ns(self, when) -> int:
+        """Epoch nanoseconds of a timestamp, reading naive ones in the bars' time zone."""
+        when = pd.Timestamp(when)
+        if when.tzinfo is None and self.tz is not None:
+            when = when.tz_localize(self.tz)
+        return when.value
+
+    def timestamp(self, position: int) -> pd.Timestamp:
+        value = pd.Timestamp(int(self.timestamps[position]), tz="UTC" if self.tz else None)
+        return value.tz_convert(self.tz) if self.tz else value
+
+    @property
+    def last(self) -> pd.Timestamp:
+        return self.timestamp(-1)
+
+    def search(self, when) -> int:
+        """Position of the first bar at or after when."""
+        return int(np.searchsorted(self.timestamps, self.ns(when), side="left"))
+
+    def slice(self, start=None, end=None) -> "Bars":
+        """Bars from start (inclusive) to end (exclusive), as views over the same buffers."""
+        first = 0 if start is None else self.search(start)
+        stop = len(self) if end is None else self.search(end)
+        return Bars(self.timestamps[first:stop], {name: column[first:stop] for name, column in self.columns.items()},
+                    self.tz, self.index_name, self.meta, self.source)
+
+    def to_frame(self) -> pd.DataFrame:
+        """A DataFrame indexed by time zone aware timestamps; this copies the values."""
+        index = pd.DatetimeIndex(self.timestamps.view("datetime64[ns]"), name=self.index_name)
+        if self.tz is not None:
+            index = index.tz_localize("UTC").tz_convert(self.tz)
+        return pd.DataFrame(self.columns, index=index)
+
+
+def write(path: str, bars: Bars):
+    """Write bars to path atomically."""
+    header = json.dumps({
+        "length": len(bars),
+        "index": bars.index_name,
+        "tz": bars.tz,
+        "columns": [{"name": name, "dtype": column.dtype.str} for name, column in bars.columns.items()],
+        "meta": bars.meta,
+    }).encode("utf-8")
+    header += b" " * (-len(header) % 8)
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREFIX.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+            f.write(np.ascontiguousarray(bars.timestamps, dtype="<i8"))
+            for column in bars.columns.values():
+                f.write(np.ascontiguousarray(column))
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
+
+
+def file_state(path: str):
+    """(inode, mtime) of path, or None when it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def read(path: str) -> Bars:
+    """Map a bars file read-only; the columns are views over the mapping."""
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, header_size = _PREFIX.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} bars file")
+    offset = _PREFIX.size + header_size
+    header = json.loads(buffer[_PREFIX.size:offset])
+    length = header["length"]
+    timestamps = np.frombuffer(buffer, dtype="<i8", count=length, offset=offset)
+    columns = {}
+    for column in header["columns"]:
+        offset += 8 * length
+        columns[column["name"]] = np.frombuffer(buffer, dtype=column["dtype"], count=length, offset=offset)
+    return Bars(timestamps, columns, header["tz"], header["index"], header["meta"],
+                source=(stat.st_ino, stat.st_mtime_ns))
@@ -0,0 +1,283 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# Offline benchmarks for the MCP tools and the dashboard transforms.
+# Yahoo Finance and the LLM are replaced by the deterministic stand-ins in
+# fakes.py, so timings only move when our own code gets slower or faster.
+#
+#   python benchmark.py --save-baseline   # record this machine's baseline
+#   python benchmark.py                   # compare against it
+#
+# Configure the server modules before they are imported: no rate limiting,
+# no on-disk cache, no event-loop lag sampling.
+os.environ["YAHOO_RATE"] = "0"
+os.environ.pop("CACHE_DB_PATH", None)
+os.environ.setdefault("LOOP_LAG_INTERVAL", "0")
+
+import fakes  # noqa: E402
+
+fakes.install()
+
+from fastmcp import Client  # noqa: E402
+
+import barfile  # noqa: E402
+import dashboard  # noqa: E402
+import mcp_server  # noqa: E402
+import statements  # noqa: E402
+import stock_data  # noqa: E402
+from stock_cache import cache  # noqa: E402
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+SYMBOL = "AAPL"
+BATCH_SYMBOLS = ["AAPL", "MSFT", "NVDA", "GOOGL", "AMZN", "META", "TSLA", "JPM"]
+# Enough tickers for a comparison table
+PEER_SYMBOLS = [f"PEER{i}" for i in range(50)]
+INFO_FIELDS = ["longName", "sector", "industry", "currentPrice", "marketCap", "trailingPE"]
+TEN_YEARS_DAILY = {"symbol": SYMBOL, "period": "10y", "interval": "1d"}
+
+# name -> (tool, arguments); each is timed with an empty cache and a warm one
+TOOL_CASES = {
+    "fetch_stock_info": ("fetch_stock_info", {"symbol": SYMBOL}),
+    "fetch_stock_info[fields]": ("fetch_stock_info", {"symbol": SYMBOL, "fields": INFO_FIELDS}),
+    "fetch_price_history": ("fetch_price_history", {"symbol": SYMBOL}),
+    "fetch_price_history[10y daily]": ("fetch_price_history", TEN_YEARS_DAILY),
+    "fetch_price_history[10y daily columnar]": ("fetch_price_history", {**TEN_YEARS_DAILY, "format": "columnar"}),
+    "fetch_quarterly_financials": ("fetch_quarterly_financials", {"symbol": SYMBOL}),
+    "fetch_quarterly_financials[4 periods]": ("fetch_quarterly_financials", {"symbol": SYMBOL, "last_n_periods": 4}),
+    "fetch_annual_financials": ("fetch_annual_financials", {"symbol": SYMBOL}),
+    "fetch_balance_sheet": ("fetch_balance_sheet", {"symbol": SYMBOL}),
+    "fetch_cash_flow": ("fetch_cash_flow", {"symbol": SYMBOL}),
+    "fetch_news": ("fetch_news", {"symbol": SYMBOL}),
+    "fetch_stock_info_batch": ("fetch_stock_info_batch", {"symbols": BATCH_SYMBOLS}),
+    "fetch_price_history_batch": ("fetch_price_history_batch", {"symbols": BATCH_SYMBOLS}),
+    "fetch_quarterly_financials_batch": ("fetch_quarterly_financials_batch", {"symbols": BATCH_SYMBOLS}),
+    "fetch_annual_financials_batch": ("fetch_annual_financials_batch", {"symbols": BATCH_SYMBOLS}),
+    "fetch_balance_sheet_batch": ("fetch_balance_sheet_batch", {"symbols": BATCH_SYMBOLS}),
+    "fetch_cash_flow_batch": ("fetch_cash_flow_batch", {"symbols": BATCH_SYMBOLS}),
+    "fetch_dashboard_bundle": ("fetch_dashboard_bundle", {"symbol": SYMBOL}),
+    "fetch_dashboard_bundle[projected columnar]": ("fetch_dashboard_bundle", {
+        "symbol": SYMBOL, "history_format": "columnar", "info_fields": INFO_FIELDS, "last_n_periods": 4,
+    }),
+    "get_recommendation": ("get_recommendation", {"symbol": SYMBOL}),
+    "get_cache_stats": ("get_cache_stats", {}),
+    "get_upstream_stats": ("get_upstream_stats", {}),
+    "get_trace": ("get_trace", {"trace_id": "0" * 32}),
+}
+
+INCOME_METRICS = ["Total Revenue", "Gross Profit", "Operating Income", "Net Income", "Diluted EPS"]
+BALANCE_METRICS = ["Total Assets", "Total Liab", "Total Stockholder Equity", "Cash And Cash Equivalents",
+                   "Short Term Investments"]
+CASHFLOW_METRICS = ["Total Cash From Operating Activities", "Capital Expenditures", "Free Cash Flow",
+                    "Total Cashflows From Investing Activities", "Total Cash From Financing Activities"]
+
+
+def summarize(samples: list) -> dict:
+    """Timing statistics in milliseconds."""
+    ms = sorted(sample * 1000 for sample in samples)
+    p95 = statistics.quantiles(ms, n=20, method="inclusive")[-1] if len(ms) > 1 else ms[0]
+    return {
+        "runs": len(ms),
+        "min_ms": round(ms[0], 4),
+        "median_ms": round(statistics.median(ms), 4),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "p95_ms": round(p95, 4),
+    }
+
+
+def time_sync(fn, repeat: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+async def time_async(fn, repeat: int, warmup: int, setup=None) -> dict:
+    """Time an async callable; setup (untimed) runs before every call."""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        await fn()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+async def bench_tools(client, repeat: int, warmup: int, selected) -> dict:
+    results = {}
+
+    def call(tool, arguments):
+        return lambda: client.call_tool(tool, arguments)
+
+    def clear():
+        cache.clear()
+        stock_data.price_store.clear()
+
+    for name, (tool, arguments) in TOOL_CASES.items():
+        if selected(f"tool/{name} cold"):
+            results[f"tool/{name} cold"] = await time_async(call(tool, arguments), repeat, warmup, setup=clear)
+        # Cache entry expired, stored bars kept: only the bars since the latest one are fetched
+        if tool == "fetch_price_history" and selected(f"tool/{name} delta"):
+            await client.call_tool(tool, arguments)
+            max_age, stock_data.price_store.max_age = stock_data.price_store.max_age, 0
+            try:
+                results[f"tool/{name} delta"] = await time_async(call(tool, arguments), repeat, warmup,
+                                                                 setup=cache.clear)
+            finally:
+                stock_data.price_store.max_age = max_age
+        if selected(f"tool/{name} warm"):
+            await client.call_tool(tool, arguments)
+            results[f"tool/{name} warm"] = await time_async(call(tool, arguments), repeat, warmup)
+    # Prompt inputs cached, model called every time
+    name = "tool/get_recommendation[refresh] warm"
+    if selected(name):
+        results[name] = await time_async(call("get_recommendation", {"symbol": SYMBOL, "refresh": True}), repeat, warmup)
+    return results
+
+
+async def load_payload(client, tool: str, arguments: dict):
+    """A tool result decoded the way the dashboards decode it."""
+    result = await client.call_tool(tool, arguments)
+    return json.loads(result.content[0].text)
+
+
+async def bench_transforms(client, repeat: int, warmup: int, selected) -> dict:
+    annual = await load_payload(client, "fetch_annual_financials", {"symbol": SYMBOL})
+    balance = await load_payload(client, "fetch_balance_sheet", {"symbol": SYMBOL})
+    cashflow = await load_payload(client, "fetch_cash_flow", {"symbol": SYMBOL})
+    quarterly = await load_payload(client, "fetch_quarterly_financials", {"symbol": SYMBOL})
+    history = await load_payload(client, "fetch_price_history", TEN_YEARS_DAILY)
+    history_columnar = await load_payload(client, "fetch_price_history", {**TEN_YEARS_DAILY, "format": "columnar"})
+    history_text = json.dumps(history)
+    peers = {}
+    for symbol in PEER_SYMBOLS:
+        peers[symbol] = await load_payload(client, "fetch_annual_financials", {"symbol": symbol})
+    peer_values = statements.frame(peers)
+    bars_dir = tempfile.mkdtemp()
+    bars_path = os.path.join(bars_dir, f"{SYMBOL}_1d.bars")
+    barfile.write(bars_path, barfile.Bars.from_frame(fakes.FakeTicker(SYMBOL).history(period="max", interval="1d")))
+    mapped = barfile.read(bars_path)
+
+    cases = {
+        "fin_table[income]": lambda: statements.fin_table(annual, INCOME_METRICS, INCOME_METRICS),
+        "fin_table[balance]": lambda: statements.fin_table(balance, BALANCE_METRICS, BALANCE_METRICS),
+        "fin_table[cashflow]": lambda: statements.fin_table(cashflow, CASHFLOW_METRICS, CASHFLOW_METRICS),
+        "comparison_table[50 symbols]": lambda: statements.comparison_table(peers, INCOME_METRICS),
+        "margins[50 symbols]": lambda: statements.margins(peer_values, INCOME_METRICS[1:4]),
+        "prepare_price_history[10y daily json]": lambda: dashboard.prepare_price_history(history_text),
+        "prepare_price_history[10y daily dict]": lambda: dashboard.prepare_price_history(dict(history)),
+        "prepare_price_history[10y daily columnar]": lambda: dashboard.prepare_price_history(history_columnar),
+        "quarterly_chart_data[20 quarters]": lambda: dashboard.quarterly_chart_data(quarterly),
+        "barfile.read[10y daily]": lambda: barfile.read(bars_path),
+        "Bars.slice[10y daily, last year]": lambda: mapped.slice("2024-01-01"),
+        "Bars.slice+to_frame[10y daily, last year]": lambda: mapped.slice("2024-01-01").to_frame(),
+    }
+    try:
+        return {
+            f"transform/{name}": time_sync(fn, repeat, warmup)
+            for name, fn in cases.items() if selected(f"transform/{name}")
+        }
+    finally:
+        shutil.rmtree(bars_dir, ignore_errors=True)
+
+
+async def run(repeat: int, warmup: int, pattern: str) -> dict:
+    def selected(name):
+        return not pattern or pattern in name
+
+    async with Client(mcp_server.mcp) as client:
+        results = await bench_tools(client, repeat, warmup, selected)
+        results.update(await bench_transforms(client, repeat, warmup, selected))
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list:
+    """Cases whose median grew by more than threshold (and by at least min_delta_ms) over the baseline."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        delta = current["median_ms"] - previous["median_ms"]
+        if delta > min_delta_ms and current["median_ms"] > previous["median_ms"] * (1 + threshold):
+            regressions.append((name, previous["median_ms"], current["median_ms"]))
+    return regressions
+
+
+def print_table(results: dict, baseline: dict):
+    width = max(len(name) for name in results)
+    print(f"{'case':<{width}} {'median':>10} {'p95':>10} {'min':>10} {'vs base':>9}")
+    for name, stats in results.items():
+        previous = baseline.get(name)
+        change = f"{(stats['median_ms'] / previous['median_ms'] - 1) * 100:+8.1f}%" if previous and previous["median_ms"] else ""
+        print(f"{name:<{width}} {stats['median_ms']:>8.3f}ms {stats['p95_ms']:>8.3f}ms {stats['min_ms']:>8.3f}ms {change:>9}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the MCP tools and dashboard transforms.")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per case")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per case before timing")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this text")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to the baseline file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="fail when a median grows by more than this fraction over the baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="ignore slowdowns smaller than this many milliseconds")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.repeat, args.warmup, args.filter))
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("results", {})
+    print_table(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if not baseline:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    for name, before, after in regressions:
+        print(f"REGRESSION {name}: {before:.3f}ms -> {after:.3f}ms")
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
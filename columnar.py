@@ -0,0 +1,88 @@
+import base64
+
+import numpy as np
+import pandas as pd
+
+# Wire format for tabular tool results: one base64 blob of packed
+# little-endian values per column instead of JSON lists of Python objects.
+#
+#   {"format": "columnar", "length": n,
+#    "columns": [{"name": ..., "dtype": "<f8" | "<i8" | "|b1" | "datetime", "tz": ..., "data": base64}]}
+#
+# Datetime columns are int64 nanoseconds since the epoch (UTC) with the
+# original time zone alongside. Columns of any other type fall back to a
+# JSON list under "values".
+FORMAT = "columnar"
+FORMATS = ("json", FORMAT)
+
+
+def _pack(values: np.ndarray, dtype: str) -> str:
+    return base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode("ascii")
+
+
+def _encode_column(name, series: pd.Series) -> dict:
+    column = {"name": str(name)}
+    if pd.api.types.is_datetime64_any_dtype(series):
+        tz = getattr(series.dt, "tz", None)
+        if tz is not None:
+            series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+        column.update(dtype="datetime", tz=str(tz) if tz is not None else None,
+                      data=_pack(series.to_numpy(dtype="datetime64[ns]").view("i8"), "<i8"))
+    elif pd.api.types.is_bool_dtype(series):
+        column.update(dtype="|b1", data=_pack(series.to_numpy(), "|b1"))
+    elif pd.api.types.is_integer_dtype(series):
+        column.update(dtype="<i8", data=_pack(series.to_numpy(), "<i8"))
+    elif pd.api.types.is_float_dtype(series):
+        column.update(dtype="<f8", data=_pack(series.to_numpy(), "<f8"))
+    else:
+        column.update(dtype="object", values=series.astype(str).tolist())
+    return column
+
+
+def encode_frame(data) -> dict:
+    """Encode a DataFrame or a to_dict(orient="list") payload in the columnar format."""
+    frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    return {
+        "format": FORMAT,
+        "length": len(frame),
+        "columns": [_encode_column(name, frame[name]) for name in frame.columns],
+    }
+
+
+def encode_bars(bars) -> dict:
+    """Encode barfile.Bars straight from its arrays, with the timestamps as the first column.
+
+    The stored columns are already packed little-endian, so mapped bars are
+    encoded without building a DataFrame or any Python objects.
+    """
+    columns = [{"name": bars.index_name, "dtype": "datetime", "tz": bars.tz, "data": _pack(bars.timestamps, "<i8")}]
+    for name, values in bars.columns.items():
+        columns.append({"name": name, "dtype": values.dtype.str, "data": _pack(values, values.dtype.str)})
+    return {"format": FORMAT, "length": len(bars), "columns": columns}
+
+
+def decode_frame(payload: dict) -> pd.DataFrame:
+    """Decode a columnar payload into a DataFrame.
+
+    Numeric columns are read-only views over the decoded buffers rather
+    than copies.
+    """
+    columns = {}
+    for column in payload.get("columns", []):
+        if column["dtype"] == "object":
+            columns[column["name"]] = column["values"]
+            continue
+        buffer = base64.b64decode(column["data"])
+        if column["dtype"] == "datetime":
+            values = pd.DatetimeIndex(np.frombuffer(buffer, dtype="<i8").view("datetime64[ns]"))
+            values = values.tz_localize("UTC")
+            if column.get("tz"):
+                values = values.tz_convert(column["tz"])
+            columns[column["name"]] = values
+        else:
+            columns[column["name"]] = np.frombuffer(buffer, dtype=column["dtype"])
+    return pd.DataFrame(columns, copy=False)
+
+
+def is_columnar(payload) -> bool:
+    return isinstance(payload, dict) and payload.get("format") == FORMAT
@@ -0,0 +1,102 @@
+import json
+import os
+
+import pandas as pd
+
+import columnar
+from tool_cache import ToolCache
+
+# Shared data preparation for the Streamlit dashboards (web_app.py and
+# tcp_web_app.py). Kept free of Streamlit calls so it can be benchmarked.
+
+REVENUE_ROWS = ['Total Revenue', 'Normalized EBITDA', 'Revenue']
+PROFIT_ROWS = ['Net Income', 'Net Income From Continuing Operation Net Minority Interest', 'Profit']
+
+# Seconds a dashboard process reuses a symbol's data for every Streamlit session
+DASHBOARD_CACHE_TTL_BUNDLE = float(os.getenv("DASHBOARD_CACHE_TTL_BUNDLE", "30"))
+DASHBOARD_CACHE_TTL_RECOMMENDATION = float(os.getenv("DASHBOARD_CACHE_TTL_RECOMMENDATION", "600"))
+DASHBOARD_CACHE_MAX_BYTES = int(os.getenv("DASHBOARD_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+def make_cache() -> ToolCache:
+    """Cache for the bundle and recommendation a dashboard process has fetched, keyed by symbol."""
+    return ToolCache(
+        max_bytes=DASHBOARD_CACHE_MAX_BYTES,
+        ttls={"bundle": DASHBOARD_CACHE_TTL_BUNDLE, "recommendation": DASHBOARD_CACHE_TTL_RECOMMENDATION},
+        early_refresh_beta=0,
+    )
+
+
+def prepare_price_history(price_history, rows: int = 12) -> pd.DataFrame:
+    """Turn a price_history payload into the chart's DataFrame.
+
+    Accepts a JSON string, a dict of lists or a columnar payload. Returns
+    the last rows by date with a Month label column, or an empty DataFrame.
+    """
+    # Try to parse if it's a string
+    if isinstance(price_history, str):
+        try:
+            price_history = json.loads(price_history)
+        except Exception:
+            price_history = {}
+
+    if columnar.is_columnar(price_history):
+        # Typed columns: dates arrive as datetimes, no re-parsing needed
+        df_hist = columnar.decode_frame(price_history)
+    elif isinstance(price_history, dict) and price_history:
+        df_hist = pd.DataFrame(price_history)
+    else:
+        return pd.DataFrame()
+
+    if df_hist.empty or 'Date' not in df_hist:
+        return pd.DataFrame()
+    if not pd.api.types.is_datetime64_any_dtype(df_hist['Date']):
+        df_hist['Date'] = df_hist['Date'].astype(str)
+        df_hist['Date'] = pd.to_datetime(df_hist['Date'], errors='coerce', utc=True)
+    df_hist = df_hist.dropna(subset=['Date'])
+    df_hist = df_hist.sort_values('Date')
+    df_hist = df_hist.tail(rows)
+    df_hist['Month'] = df_hist['Date'].dt.strftime('%b %Y')
+    return df_hist
+
+
+def quarterly_chart_data(quarterly, quarters: int = 4) -> dict:
+    """Revenue and profit in billions for the last quarters.
+
+    Returns {"quarters", "revenue", "profit", "latest_incomplete"}, or
+    {"message"} explaining why there is nothing to plot.
+    """
+    if isinstance(quarterly, str):
+        try:
+            quarterly = json.loads(quarterly)
+        except Exception:
+            return {"message": f"Could not parse quarterly financials. Received: {quarterly}"}
+
+    if not isinstance(quarterly, dict) or not quarterly:
+        return {"message": "No quarterly financial data available."}
+    df_quarterly = pd.DataFrame(quarterly)
+    if df_quarterly.empty:
+        return {"message": "No quarterly financial data available."}
+
+    # Use the last columns (quarters)
+    last_quarters = df_quarterly.columns[-quarters:]
+    revenue_row = next((key for key in REVENUE_ROWS if key in df_quarterly.index), None)
+    profit_row = next((key for key in PROFIT_ROWS if key in df_quarterly.index), None)
+    if not (revenue_row and profit_row):
+        return {"message": "Could not find revenue or profit data in quarterly financials."}
+
+    labels = [pd.to_datetime(q).strftime('%b %Y') for q in last_quarters]
+    revenue = [df_quarterly.loc[revenue_row, q] / 1e9 if pd.notna(df_quarterly.loc[revenue_row, q]) else None for q in last_quarters]
+    profit = [df_quarterly.loc[profit_row, q] / 1e9 if pd.notna(df_quarterly.loc[profit_row, q]) else None for q in last_quarters]
+    # Only keep quarters where both revenue and profit are not None
+    filtered = [(q, r, p) for q, r, p in zip(labels, revenue, profit) if r is not None and p is not None]
+    if not filtered:
+        return {"message": "No valid revenue and profit data for the last four quarters."}
+    fq, fr, fp = zip(*filtered)
+    return {
+        "quarters": list(fq),
+        "revenue": list(fr),
+        "profit": list(fp),
+        # Warn if the latest quarter is missing data
+        "latest_incomplete": None in (revenue[-1], profit[-1]),
+    }
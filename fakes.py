@@ -0,0 +1,266 @@
+import asyncio
+import functools
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# Deterministic offline stand-ins for Yahoo Finance and the LLM, shaped
+# like the real responses: 10 years of daily bars, 20 quarters and 5 years
+# of statements, a full info dict and a news feed. Used by benchmark.py and
+# loadtest.py; install() swaps them in for the current process.
+
+HISTORY_YEARS = 10
+QUARTERS = 20
+ANNUAL_PERIODS = 5
+# Fixed end date so every run sees the same data
+END_DATE = pd.Timestamp("2024-12-31", tz="America/New_York")
+
+INCOME_ITEMS = [
+    "Total Revenue", "Operating Revenue", "Cost Of Revenue", "Gross Profit", "Operating Expense",
+    "Selling General And Administration", "Research And Development", "Operating Income",
+    "Net Non Operating Interest Income Expense", "Interest Income", "Interest Expense", "Other Income Expense",
+    "Pretax Income", "Tax Provision", "Net Income Common Stockholders", "Net Income",
+    "Net Income From Continuing Operation Net Minority Interest", "Diluted NI Availto Com Stockholders",
+    "Basic EPS", "Diluted EPS", "Basic Average Shares", "Diluted Average Shares", "Total Expenses",
+    "Normalized Income", "EBIT", "EBITDA", "Normalized EBITDA", "Reconciled Cost Of Revenue",
+    "Reconciled Depreciation", "Tax Rate For Calcs", "Tax Effect Of Unusual Items", "Total Unusual Items",
+    "Interest Income Non Operating", "Interest Expense Non Operating", "Total Operating Income As Reported",
+    "Net Interest Income", "Special Income Charges", "Gain On Sale Of Security", "Other Non Operating Income Expenses",
+    "Minority Interests",
+]
+BALANCE_ITEMS = [
+    "Total Assets", "Total Liab", "Total Stockholder Equity", "Cash And Cash Equivalents", "Short Term Investments",
+    "Current Assets", "Current Liabilities", "Accounts Receivable", "Inventory", "Net PPE", "Goodwill",
+    "Other Intangible Assets", "Long Term Debt", "Current Debt", "Accounts Payable", "Retained Earnings",
+    "Common Stock", "Treasury Stock", "Working Capital", "Invested Capital", "Tangible Book Value",
+    "Total Debt", "Net Debt", "Share Issued", "Ordinary Shares Number", "Total Capitalization",
+    "Other Current Assets", "Other Non Current Assets", "Other Current Liabilities", "Other Non Current Liabilities",
+]
+CASHFLOW_ITEMS = [
+    "Total Cash From Operating Activities", "Capital Expenditures", "Free Cash Flow",
+    "Total Cashflows From Investing Activities", "Total Cash From Financing Activities",
+    "Depreciation And Amortization", "Stock Based Compensation", "Change In Working Capital",
+    "Change In Receivables", "Change In Inventory", "Change In Payables", "Repurchase Of Capital Stock",
+    "Cash Dividends Paid", "Issuance Of Debt", "Repayment Of Debt", "Net Investment Purchase And Sale",
+    "Purchase Of Business", "Net Other Investing Changes", "Net Other Financing Charges", "End Cash Position",
+    "Beginning Cash Position", "Changes In Cash", "Income Tax Paid", "Interest Paid",
+]
+INFO_KEYS = [
+    "address1", "city", "state", "zip", "country", "phone", "website", "industry", "industryKey", "industryDisp",
+    "sector", "sectorKey", "sectorDisp", "longBusinessSummary", "fullTimeEmployees", "auditRisk", "boardRisk",
+    "compensationRisk", "shareHolderRightsRisk", "overallRisk", "governanceEpochDate", "compensationAsOfEpochDate",
+    "irWebsite", "maxAge", "priceHint", "previousClose", "open", "dayLow", "dayHigh", "regularMarketPreviousClose",
+    "regularMarketOpen", "regularMarketDayLow", "regularMarketDayHigh", "dividendRate", "dividendYield",
+    "exDividendDate", "payoutRatio", "fiveYearAvgDividendYield", "beta", "trailingPE", "forwardPE", "volume",
+    "regularMarketVolume", "averageVolume", "averageVolume10days", "averageDailyVolume10Day", "bid", "ask",
+    "bidSize", "askSize", "marketCap", "fiftyTwoWeekLow", "fiftyTwoWeekHigh", "priceToSalesTrailing12Months",
+    "fiftyDayAverage", "twoHundredDayAverage", "trailingAnnualDividendRate", "trailingAnnualDividendYield",
+    "currency", "enterpriseValue", "profitMargins", "floatShares", "sharesOutstanding", "sharesShort",
+    "sharesShortPriorMonth", "sharesShortPreviousMonthDate", "dateShortInterest", "sharesPercentSharesOut",
+    "heldPercentInsiders", "heldPercentInstitutions", "shortRatio", "shortPercentOfFloat", "impliedSharesOutstanding",
+    "bookValue", "priceToBook", "lastFiscalYearEnd", "nextFiscalYearEnd", "mostRecentQuarter", "earningsQuarterlyGrowth",
+    "netIncomeToCommon", "trailingEps", "forwardEps", "lastSplitFactor", "lastSplitDate", "enterpriseToRevenue",
+    "enterpriseToEbitda", "52WeekChange", "SandP52WeekChange", "lastDividendValue", "lastDividendDate", "exchange",
+    "quoteType", "symbol", "underlyingSymbol", "shortName", "longName", "firstTradeDateEpochUtc", "timeZoneFullName",
+    "timeZoneShortName", "uuid", "messageBoardId", "gmtOffSetMilliseconds", "currentPrice", "targetHighPrice",
+    "targetLowPrice", "targetMeanPrice", "targetMedianPrice", "recommendationMean", "recommendationKey",
+    "numberOfAnalystOpinions", "totalCash", "totalCashPerShare", "ebitda", "totalDebt", "quickRatio", "currentRatio",
+    "totalRevenue", "debtToEquity", "revenuePerShare", "returnOnAssets", "returnOnEquity", "freeCashflow",
+    "operatingCashflow", "earningsGrowth", "revenueGrowth", "grossMargins", "ebitdaMargins", "operatingMargins",
+    "financialCurrency", "trailingPegRatio", "regularMarketChange", "regularMarketChangePercent",
+]
+
+
+def _rng(symbol: str, salt: str = "") -> np.random.RandomState:
+    return np.random.RandomState(zlib.crc32(f"{symbol.upper()}:{salt}".encode()))
+
+
+@functools.lru_cache(maxsize=256)
+def _bars(symbol: str) -> pd.DataFrame:
+    rng = _rng(symbol, "history")
+    index = pd.bdate_range(end=END_DATE, periods=HISTORY_YEARS * 252, tz="America/New_York", name="Date")
+    close = 20 + 180 * rng.rand() + np.cumsum(rng.normal(0.05, 1.5, len(index)))
+    close = np.maximum(close, 1.0)
+    spread = np.abs(rng.normal(0, 1.0, len(index)))
+    frame = pd.DataFrame({
+        "Open": close + rng.normal(0, 0.5, len(index)),
+        "High": close + spread,
+        "Low": close - spread,
+        "Close": close,
+        "Volume": rng.randint(1_000_000, 90_000_000, len(index)).astype("int64"),
+        "Dividends": np.where(np.arange(len(index)) % 63 == 0, 0.24, 0.0),
+        "Stock Splits": 0.0,
+    }, index=index)
+    return frame
+
+
+def _daily_bars(symbol: str) -> pd.DataFrame:
+    # Generated once per symbol so the benchmarks time our code, not the fake
+    return _bars(symbol.upper()).copy()
+
+
+_PERIODS = {"1d": 1, "5d": 5, "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252, "2y": 504, "5y": 1260, "10y": 2520}
+_RULES = {"1wk": "W-FRI", "1mo": "MS", "3mo": "QS"}
+
+
+def _statement(symbol: str, items: list, periods: list, salt: str) -> pd.DataFrame:
+    rng = _rng(symbol, salt)
+    scale = 10 ** rng.uniform(9, 11)
+    growth = np.cumprod(1 + rng.normal(0.02, 0.05, len(periods)))[::-1]
+    data = {item: scale * rng.uniform(0.05, 1.0) * growth for item in items}
+    for item in items:
+        if item.endswith("EPS") or item == "Tax Rate For Calcs":
+            data[item] = np.round(data[item] / scale * 10, 2)
+    frame = pd.DataFrame(data, index=periods).T
+    # yfinance leaves gaps in older periods
+    frame.iloc[rng.randint(0, len(items), 5), -1] = np.nan
+    return frame
+
+
+class FakeTicker:
+    """Stand-in for yfinance.Ticker with deterministic per-symbol data."""
+
+    def __init__(self, symbol: str, latency: float = 0.0):
+        self.ticker = symbol.upper()
+        self.latency = latency
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    @property
+    def info(self) -> dict:
+        self._wait()
+        rng = _rng(self.ticker, "info")
+        info = {key: round(float(rng.uniform(0, 1000)), 4) for key in INFO_KEYS}
+        price = float(_daily_bars(self.ticker)["Close"].iloc[-1])
+        info.update({
+            "symbol": self.ticker, "shortName": f"{self.ticker} Inc.", "longName": f"{self.ticker} Incorporated",
+            "sector": "Technology", "industry": "Software", "country": "United States", "city": "Cupertino",
+            "state": "CA", "website": f"https://www.{self.ticker.lower()}.example.com", "currency": "USD",
+            "longBusinessSummary": " ".join(["The company designs, makes and sells products."] * 20),
+            "currentPrice": round(price, 2), "marketCap": int(price * 15e9), "trailingPE": round(rng.uniform(8, 60), 2),
+            "fullTimeEmployees": int(rng.randint(1_000, 200_000)),
+            "companyOfficers": [
+                {"maxAge": 1, "name": f"Officer {i}", "age": 40 + i, "title": "Executive", "yearBorn": 1960 + i,
+                 "fiscalYear": 2024, "totalPay": 1_000_000 * (i + 1), "exercisedValue": 0, "unexercisedValue": 0}
+                for i in range(10)
+            ],
+        })
+        return info
+
+    def history(self, period: str = "1mo", interval: str = "1d", start=None, **kwargs) -> pd.DataFrame:
+        self._wait()
+        bars = _daily_bars(self.ticker)
+        if start is not None:
+            bars = bars[bars.index >= pd.Timestamp(start)]
+        elif period != "max":
+            bars = bars.tail(_PERIODS.get(period, 252))
+        rule = _RULES.get(interval)
+        if rule:
+            bars = bars.resample(rule).agg({
+                "Open": "first", "High": "max", "Low": "min", "Close": "last",
+                "Volume": "sum", "Dividends": "sum", "Stock Splits": "sum",
+            }).dropna(subset=["Close"])
+        return bars
+
+    @property
+    def quarterly_financials(self) -> pd.DataFrame:
+        self._wait()
+        periods = pd.date_range(end="2024-12-31", periods=QUARTERS, freq=pd.offsets.QuarterEnd())[::-1]
+        return _statement(self.ticker, INCOME_ITEMS, list(periods), "quarterly")
+
+    @property
+    def financials(self) -> pd.DataFrame:
+        self._wait()
+        periods = pd.date_range(end="2024-12-31", periods=ANNUAL_PERIODS, freq=pd.offsets.YearEnd())[::-1]
+        return _statement(self.ticker, INCOME_ITEMS, list(periods), "annual")
+
+    @property
+    def balance_sheet(self) -> pd.DataFrame:
+        self._wait()
+        periods = pd.date_range(end="2024-12-31", periods=ANNUAL_PERIODS, freq=pd.offsets.YearEnd())[::-1]
+        return _statement(self.ticker, BALANCE_ITEMS, list(periods), "balance")
+
+    @property
+    def cashflow(self) -> pd.DataFrame:
+        self._wait()
+        periods = pd.date_range(end="2024-12-31", periods=ANNUAL_PERIODS, freq=pd.offsets.YearEnd())[::-1]
+        return _statement(self.ticker, CASHFLOW_ITEMS, list(periods), "cashflow")
+
+    @property
+    def news(self) -> list:
+        self._wait()
+        return [
+            {"id": f"{self.ticker}-{i}", "content": {
+                "id": f"{self.ticker}-{i}",
+                "title": f"{self.ticker} headline {i}",
+                "summary": "A short summary of the article. " * 4,
+                "pubDate": (END_DATE - pd.Timedelta(hours=3 * i)).isoformat(),
+                "provider": {"displayName": "Example News"},
+                "canonicalUrl": {"url": f"https://news.example.com/{self.ticker.lower()}/{i}"},
+                "thumbnail": {"resolutions": [{"url": f"https://img.example.com/{i}.jpg", "width": 140}]},
+            }}
+            for i in range(20)
+        ]
+
+
+class FakeTickers:
+    def __init__(self, symbols: str, latency: float = 0.0):
+        self.tickers = {symbol.upper(): FakeTicker(symbol, latency) for symbol in symbols.replace(",", " ").split()}
+
+
+def fake_download(symbols, period: str = "1mo", interval: str = "1d", group_by: str = "column", **kwargs):
+    symbols = symbols.split() if isinstance(symbols, str) else list(symbols)
+    frames = {symbol.upper(): FakeTicker(symbol).history(period=period, interval=interval) for symbol in symbols}
+    return pd.concat(frames, axis=1)
+
+
+RECOMMENDATION = json.dumps({
+    "recommendation": "Hold",
+    "icon": "🟡",
+    "reason": "Valuation is in line with peers and growth is steady.",
+    "detailed_analysis": "- **Revenue** grew steadily over the last three years\n"
+                         "- **Margins** are stable\n- Valuation is close to the sector median\n"
+                         "- Main risk: slowing demand",
+})
+
+
+class FakeLLMClient:
+    """Stand-in for llm_client.LLMClient returning a fixed recommendation after an optional delay."""
+
+    def __init__(self, latency: float = 0.0, chunk_size: int = 16):
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.in_flight = 0
+        self.retries = 0
+
+    async def complete(self, prompt: str, model: str, temperature: float, timeout: float = None) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return RECOMMENDATION
+
+    async def stream(self, prompt: str, model: str, temperature: float, timeout: float = None):
+        chunks = [RECOMMENDATION[i:i + self.chunk_size] for i in range(0, len(RECOMMENDATION), self.chunk_size)]
+        for chunk in chunks:
+            if self.latency:
+                await asyncio.sleep(self.latency / len(chunks))
+            yield chunk
+
+
+def install(yahoo_latency: float = 0.0, llm_latency: float = 0.0):
+    """Route yfinance and the LLM client of this process to the stand-ins."""
+    import yfinance
+
+    import llm_client
+
+    yfinance.Ticker = lambda symbol, *args, **kwargs: FakeTicker(symbol, yahoo_latency)
+    yfinance.Tickers = lambda symbols, *args, **kwargs: FakeTickers(symbols, yahoo_latency)
+    yfinance.download = fake_download
+    client = FakeLLMClient(llm_latency)
+    llm_client.get_client = lambda api_key: client
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import os
+import random
+import time
+
+import openai
+
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# OpenAI-compatible endpoint; point it at a local stand-in for tests and benchmarks
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or None
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+# Deadline for one completion, including retries
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _retry_after(error: Exception):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMClient:
+    """Process-wide async chat client.
+
+    Reuses one HTTP connection pool, caps in-flight requests, applies a
+    per-request deadline and retries rate limits and server errors with
+    jittered exponential backoff.
+    """
+
+    def __init__(self, api_key: str, base_url: str = LLM_BASE_URL, concurrency: int = LLM_CONCURRENCY,
+                 timeout: float = LLM_TIMEOUT, max_retries: int = LLM_MAX_RETRIES):
+        # Retries are handled here so they share the request deadline
+        self._client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._semaphore = None
+        self.in_flight = 0
+        self.retries = 0
+
+    async def complete(self, prompt: str, model: str, temperature: float, timeout: float = None) -> str:
+        """Return the model's reply to a single user message."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        deadline = time.monotonic() + (timeout or self.timeout)
+        async with self._semaphore:
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                with tracing.span("llm complete", model=model):
+                    response = await self._with_retries(
+                        lambda: self._create(prompt, model, temperature, stream=False), deadline
+                    )
+                return response.choices[0].message.content
+            except Exception:
+                metrics.upstream_errors.inc(upstream="llm", call="complete")
+                raise
+            finally:
+                self.in_flight -= 1
+                metrics.upstream_duration.observe(time.perf_counter() - started, upstream="llm", call="complete")
+
+    async def stream(self, prompt: str, model: str, temperature: float, timeout: float = None):
+        """Yield the model's reply in text chunks as it is generated.
+
+        Only opening the stream is retried; a failure after the first chunk
+        is raised to the caller.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        deadline = time.monotonic() + (timeout or self.timeout)
+        # Not activated: a generator may be finalized outside the context that started it
+        span = tracing.start_span("llm stream", model=model)
+        async with self._semaphore:
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                chunks = await self._with_retries(
+                    lambda: self._create(prompt, model, temperature, stream=True), deadline
+                )
+                iterator = chunks.__aiter__()
+                while True:
+                    remaining = max(deadline - time.monotonic(), 0.001)
+                    try:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), timeout=remaining)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            except Exception as e:
+                metrics.upstream_errors.inc(upstream="llm", call="stream")
+                span.status = "error"
+                span.attributes["error"] = str(e)
+                raise
+            finally:
+                span.end()
+                self.in_flight -= 1
+                metrics.upstream_duration.observe(time.perf_counter() - started, upstream="llm", call="stream")
+
+    def _create(self, prompt, model, temperature, stream):
+        return self._client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            stream=stream,
+        )
+
+    async def _with_retries(self, request, deadline):
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                return await asyncio.wait_for(request(), timeout=max(remaining, 0.001))
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+                if time.monotonic() + delay >= deadline:
+                    raise
+                attempt += 1
+                self.retries += 1
+                logger.warning(f"LLM request failed ({e}), retrying in {delay:.2f}s (attempt {attempt})")
+                await asyncio.sleep(delay)
+
+
+_client = None
+
+
+def get_client(api_key: str) -> LLMClient:
+    global _client
+    if _client is None:
+        _client = LLMClient(api_key)
+    return _client
@@ -0,0 +1,367 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import runpy
+import subprocess
+import sys
+import time
+from urllib.parse import urljoin
+
+import httpx
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+# Load generator for the SSE MCP server (tcp_mcp_server.py).
+#
+#   python loadtest.py run --spawn --sessions 20 --duration 60             # closed loop
+#   python loadtest.py run --spawn --sessions 20 --rate 5 --duration 60    # open loop, 5 scenarios/s
+#   python loadtest.py run --url http://host:8081/ --mix dashboard:3,quote:1
+#
+# With --spawn the server runs in a child process whose Yahoo Finance and
+# LLM calls go to the deterministic stand-ins in fakes.py, so runs are
+# repeatable on an isolated machine.
+
+SYMBOLS = ["AAPL", "MSFT", "NVDA", "GOOGL", "AMZN", "META", "TSLA", "JPM", "V", "JNJ",
+           "WMT", "PG", "XOM", "UNH", "HD", "KO", "PEP", "COST", "ORCL", "NFLX"]
+DASHBOARD_INFO_FIELDS = ["longName", "sector", "industry", "currentPrice", "marketCap", "trailingPE",
+                         "dividendYield", "fiftyTwoWeekHigh", "fiftyTwoWeekLow", "website"]
+
+# Scenarios are tool calls made one after another by one user. Calls get
+# the scenario's symbol unless they name their own symbols.
+MIXES = {
+    # The seven calls the dashboard made per Analyze click before the bundle tool
+    "dashboard": [
+        ("fetch_stock_info", {}),
+        ("fetch_price_history", {"period": "1y", "interval": "1mo"}),
+        ("fetch_quarterly_financials", {}),
+        ("fetch_annual_financials", {}),
+        ("fetch_balance_sheet", {}),
+        ("fetch_cash_flow", {}),
+        ("get_recommendation", {}),
+    ],
+    "bundle": [
+        ("fetch_dashboard_bundle", {"history_format": "columnar", "info_fields": DASHBOARD_INFO_FIELDS,
+                                    "last_n_periods": 4}),
+        ("fetch_news", {"limit": 15}),
+    ],
+    "quote": [("fetch_stock_info", {"fields": DASHBOARD_INFO_FIELDS})],
+    "history": [("fetch_price_history", {"period": "10y", "interval": "1d", "format": "columnar"})],
+    "batch": [("fetch_stock_info_batch", {"symbols": SYMBOLS[:8]})],
+}
+
+
+def parse_mix(text: str) -> list:
+    """Parse "dashboard:3,quote:1" into [(scenario, weight)]."""
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.strip().partition(":")
+        if name not in MIXES:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name!r}, expected one of {', '.join(MIXES)}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Latencies and errors per tool call and per scenario."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.dropped = 0
+        self.connect_errors = 0
+
+    def record(self, name: str, latency: float, ok: bool):
+        self.latencies.setdefault(name, []).append(latency)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        rows = {}
+        for name, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            errors = self.errors.get(name, 0)
+            rows[name] = {
+                "count": len(values),
+                "errors": errors,
+                "error_rate": round(errors / len(values), 4),
+                "throughput": round(len(values) / elapsed, 3) if elapsed else 0.0,
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+            }
+        return rows
+
+
+class Session:
+    """One SSE session, opened and closed by its own task as the anyio transport requires."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.session = None
+        self._ready = None
+        self._stop = asyncio.Event()
+        self._task = None
+
+    async def open(self):
+        self._ready = asyncio.get_running_loop().create_future()
+        self._task = asyncio.ensure_future(self._run())
+        await self._ready
+
+    async def _run(self):
+        try:
+            async with sse_client(self.url) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set_result(None)
+                    await self._stop.wait()
+        except Exception as e:
+            if not self._ready.done():
+                self._ready.set_exception(e)
+
+    async def close(self):
+        self._stop.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except Exception:
+                pass
+
+
+async def run_scenario(session, name: str, symbol: str, recorder: Recorder, timeout: float, started: float):
+    """Make the scenario's calls in order; latency counts from started (the scheduled arrival)."""
+    ok = True
+    for tool, arguments in MIXES[name]:
+        if "symbols" not in arguments:
+            arguments = {**arguments, "symbol": symbol}
+        call_started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(session.session.call_tool(tool, arguments), timeout)
+            texts = [block.text for block in result.content if getattr(block, "type", None) == "text"]
+            call_ok = not result.isError and not any(text.startswith('{"error"') for text in texts)
+        except Exception:
+            call_ok = False
+        recorder.record(f"tool {tool}", time.perf_counter() - call_started, call_ok)
+        ok = ok and call_ok
+    recorder.record(f"scenario {name}", time.perf_counter() - started, ok)
+
+
+def pick(mix: list, rng: random.Random) -> str:
+    names, weights = zip(*mix)
+    return rng.choices(names, weights)[0]
+
+
+async def closed_loop(sessions, mix, symbols, recorder, args, deadline, rng):
+    """Each session runs one scenario at a time, with think time between them."""
+    async def client(session):
+        while time.perf_counter() < deadline:
+            await run_scenario(session, pick(mix, rng), rng.choice(symbols), recorder, args.timeout,
+                               time.perf_counter())
+            if args.think:
+                await asyncio.sleep(rng.expovariate(1 / args.think))
+
+    await asyncio.gather(*(client(session) for session in sessions))
+
+
+async def open_loop(sessions, mix, symbols, recorder, args, deadline, rng):
+    """Start scenarios at Poisson arrivals of args.rate per second, however many are still running.
+
+    Latency is measured from the scheduled arrival, so a saturated server
+    shows up as growing latency rather than as a lower request rate.
+    """
+    outstanding = set()
+    next_session = itertools.cycle(sessions)
+    arrival = time.perf_counter()
+    while True:
+        arrival += rng.expovariate(args.rate)
+        if arrival >= deadline:
+            break
+        await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+        if len(outstanding) >= args.max_outstanding:
+            recorder.dropped += 1
+            continue
+        task = asyncio.ensure_future(run_scenario(next(next_session), pick(mix, rng), rng.choice(symbols),
+                                                  recorder, args.timeout, arrival))
+        outstanding.add(task)
+        task.add_done_callback(outstanding.discard)
+    if outstanding:
+        await asyncio.wait(outstanding, timeout=args.timeout * 2)
+
+
+async def server_memory(client: httpx.AsyncClient, metrics_url: str):
+    """The server's resident memory in bytes from its /metrics endpoint, or None."""
+    try:
+        response = await client.get(metrics_url, timeout=5)
+        for line in response.text.splitlines():
+            if line.startswith("process_resident_memory_bytes "):
+                return float(line.split()[1])
+    except Exception:
+        pass
+    return None
+
+
+async def sample_memory(client, metrics_url, samples: list, interval: float = 1.0):
+    while True:
+        value = await server_memory(client, metrics_url)
+        if value is not None:
+            samples.append(value)
+        await asyncio.sleep(interval)
+
+
+async def load(args) -> dict:
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    symbols = [symbol.strip().upper() for symbol in args.symbols.split(",") if symbol.strip()]
+    recorder = Recorder()
+    metrics_url = urljoin(args.url, "/metrics")
+
+    sessions = [Session(args.url) for _ in range(args.sessions)]
+    results = await asyncio.gather(*(session.open() for session in sessions), return_exceptions=True)
+    connected = [session for session, result in zip(sessions, results) if not isinstance(result, Exception)]
+    recorder.connect_errors = len(sessions) - len(connected)
+    if not connected:
+        raise RuntimeError(f"Could not open any session to {args.url}: {results[0]}")
+
+    async with httpx.AsyncClient() as http:
+        memory_before = await server_memory(http, metrics_url)
+        memory_samples = []
+        sampler = asyncio.ensure_future(sample_memory(http, metrics_url, memory_samples))
+        started = time.perf_counter()
+        deadline = started + args.duration
+        if args.rate:
+            await open_loop(connected, mix, symbols, recorder, args, deadline, rng)
+        else:
+            await closed_loop(connected, mix, symbols, recorder, args, deadline, rng)
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+        memory_after = await server_memory(http, metrics_url)
+
+    await asyncio.gather(*(session.close() for session in sessions))
+
+    memory = {"before": memory_before, "after": memory_after,
+              "peak": max(memory_samples + [memory_after or 0]) or None}
+    if memory_before and memory_after:
+        memory["growth"] = memory_after - memory_before
+    return {
+        "mode": "open" if args.rate else "closed",
+        "sessions": len(connected),
+        "connect_errors": recorder.connect_errors,
+        "rate": args.rate,
+        "mix": dict(mix),
+        "duration": round(elapsed, 3),
+        "dropped": recorder.dropped,
+        "memory_bytes": memory,
+        "results": recorder.summary(elapsed),
+    }
+
+
+def print_report(report: dict):
+    print(f"{report['mode']}-loop, {report['sessions']} sessions, {report['duration']:.1f}s"
+          + (f", {report['rate']}/s arrivals" if report["rate"] else "")
+          + (f", {report['connect_errors']} sessions failed to connect" if report["connect_errors"] else "")
+          + (f", {report['dropped']} arrivals dropped" if report["dropped"] else ""))
+    rows = report["results"]
+    if rows:
+        width = max(len(name) for name in rows)
+        print(f"{'':<{width}} {'count':>7} {'err%':>6} {'per s':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+        for name, row in rows.items():
+            print(f"{name:<{width}} {row['count']:>7} {row['error_rate'] * 100:>5.1f}% {row['throughput']:>8.2f} "
+                  f"{row['p50_ms']:>7.1f}ms {row['p95_ms']:>7.1f}ms {row['p99_ms']:>7.1f}ms")
+    memory = report["memory_bytes"]
+    if memory.get("growth") is not None:
+        print(f"server memory: {memory['before'] / 2**20:.1f} MiB -> {memory['after'] / 2**20:.1f} MiB "
+              f"(peak {memory['peak'] / 2**20:.1f} MiB, growth {memory['growth'] / 2**20:+.1f} MiB)")
+    else:
+        print("server memory: unavailable (no process_resident_memory_bytes at /metrics)")
+
+
+def spawn_server(args) -> subprocess.Popen:
+    command = [sys.executable, os.path.abspath(__file__), "serve", "--port", str(args.port),
+               "--yahoo-latency", str(args.yahoo_latency), "--llm-latency", str(args.llm_latency)]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL if args.quiet else None)
+    metrics_url = urljoin(args.url, "/metrics")
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with status {server.returncode}")
+        try:
+            httpx.get(metrics_url, timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"Server did not start listening on {args.url}")
+
+
+def serve(args):
+    """Run tcp_mcp_server.py against the offline stand-ins."""
+    import fakes
+
+    fakes.install(yahoo_latency=args.yahoo_latency, llm_latency=args.llm_latency)
+    os.environ["MCP_SERVER_PORT"] = str(args.port)
+    runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tcp_mcp_server.py"),
+                   run_name="__main__")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load generator for the SSE MCP server.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="open sessions and replay a mix of tool calls")
+    run.add_argument("--url", help="SSE endpoint (default: http://127.0.0.1:PORT/)")
+    run.add_argument("--spawn", action="store_true", help="start a server with offline stand-ins for the run")
+    run.add_argument("--port", type=int, default=int(os.getenv("MCP_SERVER_PORT", "8081")))
+    run.add_argument("--sessions", type=int, default=10, help="concurrent SSE sessions")
+    run.add_argument("--duration", type=float, default=30, help="seconds to generate load")
+    run.add_argument("--rate", type=float, default=0,
+                     help="open loop: scenarios started per second across all sessions (default: closed loop)")
+    run.add_argument("--think", type=float, default=0, help="closed loop: mean seconds between a session's scenarios")
+    run.add_argument("--max-outstanding", type=int, default=1000,
+                     help="open loop: arrivals beyond this many running scenarios are dropped")
+    run.add_argument("--mix", default="dashboard", help=f"weighted scenarios, e.g. dashboard:3,quote:1 ({', '.join(MIXES)})")
+    run.add_argument("--symbols", default=",".join(SYMBOLS), help="comma-separated symbols to draw from")
+    run.add_argument("--timeout", type=float, default=120, help="seconds before a tool call counts as failed")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--output", help="write the report to this JSON file")
+    run.add_argument("--yahoo-latency", type=float, default=0.15, help="--spawn: seconds per stand-in Yahoo request")
+    run.add_argument("--llm-latency", type=float, default=1.0, help="--spawn: seconds per stand-in LLM answer")
+    run.add_argument("--quiet", action="store_true", help="--spawn: hide the server's log output")
+
+    serve_parser = commands.add_parser("serve", help="run the SSE server against the offline stand-ins")
+    serve_parser.add_argument("--port", type=int, default=int(os.getenv("MCP_SERVER_PORT", "8081")))
+    serve_parser.add_argument("--yahoo-latency", type=float, default=0.15)
+    serve_parser.add_argument("--llm-latency", type=float, default=1.0)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args)
+        return 0
+
+    args.url = args.url or f"http://127.0.0.1:{args.port}/"
+    server = spawn_server(args) if args.spawn else None
+    try:
+        report = asyncio.run(load(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+import asyncio
+import itertools
+import logging
+import os
+import queue
+import threading
+
+from mcp import ClientSession
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+MCP_HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", "30"))
+MCP_CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", "120"))
+
+
+class _PooledSession:
+    """One initialized ClientSession.
+
+    The transport and session contexts are entered and exited by a single
+    long-lived task, as the anyio-based transports require.
+    """
+
+    def __init__(self, connect):
+        self.connect = connect
+        self.session = None
+        self.lock = None
+        self._closed = None
+        self._task = None
+
+    async def open(self):
+        ready = asyncio.get_running_loop().create_future()
+        self._closed = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run(ready))
+        await ready
+
+    async def _run(self, ready):
+        try:
+            async with self.connect() as streams:
+                read, write = streams[0], streams[1]
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self.session = session
+                    ready.set_result(None)
+                    await self._closed.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.error(f"MCP session closed unexpectedly: {e}")
+        finally:
+            self.session = None
+
+    async def close(self):
+        if self._closed is not None:
+            self._closed.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except Exception as e:
+                logger.warning(f"Error closing MCP session: {e}")
+            self._task = None
+
+    async def reconnect(self):
+        await self.close()
+        await self.open()
+
+    async def ping(self) -> bool:
+        if self.session is None:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=5)
+            return True
+        except Exception:
+            return False
+
+
+class MCPSessionPool:
+    """Process-wide pool of warm MCP client sessions.
+
+    Sessions live on a background event loop so they survive across the
+    asyncio.run() calls and Streamlit reruns of the calling script. Idle
+    sessions are pinged periodically and reconnected when the server has
+    gone away.
+    """
+
+    def __init__(self, connect, size: int = MCP_POOL_SIZE, health_check_interval: float = MCP_HEALTH_CHECK_INTERVAL):
+        self._slots = [_PooledSession(connect) for _ in range(max(1, size))]
+        self._next = itertools.count()
+        self.health_check_interval = health_check_interval
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mcp-pool", daemon=True)
+        self._thread.start()
+        if health_check_interval > 0:
+            asyncio.run_coroutine_threadsafe(self._health_loop(), self._loop)
+
+    def run(self, coro, timeout: float = MCP_CALL_TIMEOUT):
+        """Run a coroutine on the pool's event loop and wait for its result."""
+        return self._submit(coro).result(timeout)
+
+    def _submit(self, coro):
+        # Carry the caller's active span over to the pool's loop thread
+        return asyncio.run_coroutine_threadsafe(self._in_span(tracing.current(), coro), self._loop)
+
+    @staticmethod
+    async def _in_span(parent, coro):
+        with tracing.activate(parent):
+            return await coro
+
+    async def _ready_slot(self) -> _PooledSession:
+        slot = self._slots[next(self._next) % len(self._slots)]
+        if slot.lock is None:
+            slot.lock = asyncio.Lock()
+        async with slot.lock:
+            if slot.session is None:
+                logger.info("Opening MCP session")
+                await slot.reconnect()
+        return slot
+
+    async def _invoke(self, name: str, arguments: dict, on_progress=None):
+        """Call a tool on a pooled session and return its text content.
+
+        The call runs in a span whose traceparent is sent in the request's
+        _meta, so the server's spans join the caller's trace. A session that
+        has died is reconnected and the call retried once.
+        """
+        with tracing.span(f"mcp.call_tool {name}") as span:
+            meta = {"traceparent": span.traceparent()}
+
+            async def call(slot):
+                result = await slot.session.call_tool(name, arguments, progress_callback=on_progress, meta=meta)
+                text = "".join(block.text for block in result.content if getattr(block, "type", None) == "text")
+                if result.isError:
+                    raise RuntimeError(text)
+                return text
+
+            slot = await self._ready_slot()
+            try:
+                return await call(slot)
+            except Exception:
+                if await slot.ping():
+                    raise
+                logger.warning(f"MCP session lost during {name}, reconnecting")
+                async with slot.lock:
+                    if not await slot.ping():
+                        await slot.reconnect()
+                return await call(slot)
+
+    async def acall_tool(self, name: str, arguments: dict):
+        """Invoke a tool and return its text content."""
+        return await self._invoke(name, arguments)
+
+    async def astream_tool(self, name: str, arguments: dict, on_progress):
+        """Invoke a tool, passing its progress notifications to on_progress.
+
+        on_progress is awaited with (progress, total, message). Returns the
+        tool's text content.
+        """
+        return await self._invoke(name, arguments, on_progress)
+
+    def stream_tool(self, name: str, arguments: dict) -> queue.Queue:
+        """Start a tool call on the pool's loop and return a queue of its events.
+
+        The queue receives ("progress", message) for each progress message,
+        then a final ("result", text) or ("error", exception).
+        """
+        events = queue.Queue()
+
+        async def on_progress(progress, total, message):
+            if message:
+                events.put(("progress", message))
+
+        async def run():
+            try:
+                events.put(("result", await self.astream_tool(name, arguments, on_progress)))
+            except Exception as e:
+                events.put(("error", e))
+
+        self._submit(run())
+        return events
+
+    def call_tool(self, name: str, arguments: dict, timeout: float = MCP_CALL_TIMEOUT):
+        return self.run(self.acall_tool(name, arguments), timeout)
+
+    async def acall_tools(self, calls: dict) -> dict:
+        """Run {key: (tool name, arguments)} concurrently across the pooled sessions.
+
+        Each result is the tool output or the exception that call raised, so
+        one failing call does not discard the others.
+        """
+        keys = list(calls)
+        results = await asyncio.gather(
+            *(self.acall_tool(name, arguments) for name, arguments in calls.values()),
+            return_exceptions=True,
+        )
+        return dict(zip(keys, results))
+
+    def call_tools(self, calls: dict, timeout: float = MCP_CALL_TIMEOUT) -> dict:
+        return self.run(self.acall_tools(calls), timeout)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for slot in self._slots:
+                if slot.session is None or slot.lock is None or slot.lock.locked():
+                    continue
+                if await slot.ping():
+                    continue
+                logger.warning("MCP session failed health check, reconnecting")
+                async with slot.lock:
+                    try:
+                        await slot.reconnect()
+                    except Exception as e:
+                        logger.error(f"Error reconnecting MCP session: {e}")
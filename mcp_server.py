@@ -1,10 +1,21 @@
-import yfinance as yf
-from fastmcp import FastMCP
-import os
-import openai
+from fastmcp import FastMCP, Context
+from starlette.responses import PlainTextResponse
+import json
 from dotenv import load_dotenv
 import logging
 import sys
+import asyncio
+
+import columnar
+import metrics as server_metrics
+import prefetch
+import recommendation
+import screener
+import server_middleware
+import stock_data
+import tracing
+import upstream
+from stock_cache import cache
 
 # Set up logging
 logging.basicConfig(
@@ -17,189 +28,193 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-mcp = FastMCP("stocks")
+mcp = FastMCP("stocks", tool_serializer=server_metrics.timed_serializer)
+mcp.add_middleware(server_middleware.TracingMiddleware())
+mcp.add_middleware(server_middleware.MetricsMiddleware())
+
+
+@server_metrics.register_collector
+def _collect_server_stats():
+    cache_stats = cache.stats()
+    samples = [
+        ("stock_cache_hit_ratio", "Share of cache lookups served from the cache", {(): cache_stats["hit_ratio"]}),
+        ("stock_cache_entries", "Entries in the in-memory tool cache", {(): cache_stats["entries"]}),
+        ("stock_cache_bytes", "Estimated size of the in-memory tool cache", {(): cache_stats["bytes"]}),
+        ("stock_cache_in_flight", "Cache fetches currently running", {(): cache_stats["in_flight"]}),
+    ]
+    for name, upstream_stats in upstream.stats().items():
+        samples.append(("upstream_queued", "Requests waiting for admission to an upstream", {
+            (("priority", level), ("upstream", name)): count for level, count in upstream_stats["queued"].items()
+        }))
+        samples.append(("upstream_in_flight", "Upstream requests currently running",
+                        {(("upstream", name),): upstream_stats["in_flight"]}))
+        samples.append(("upstream_tokens", "Tokens left in the upstream's rate budget",
+                        {(("upstream", name),): upstream_stats["tokens"]}))
+    return samples
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request):
+    """Prometheus text-format metrics for the SSE server."""
+    return PlainTextResponse(server_metrics.render(), media_type="text/plain; version=0.0.4")
 
 @mcp.tool()
-def fetch_stock_info(symbol: str) -> dict:
-    """Get Company's general information."""
-    try:
-        logger.info(f"Fetching stock info for {symbol}")
-        stock = yf.Ticker(symbol)
-        info = stock.info
-        if not info:
-            logger.warning(f"No info found for {symbol}")
-            return {}
-        return info
-    except Exception as e:
-        logger.error(f"Error fetching stock info for {symbol}: {e}")
-        return {}
+async def fetch_stock_info(symbol: str, fields: list[str] | None = None) -> dict:
+    """Get Company's general information. Pass fields to return only those keys."""
+    info = await upstream.run_cached("yahoo", stock_data.fetch_stock_info, symbol)
+    screener.screener.observe(symbol, info)
+    return stock_data.project_info(info, fields)
 
 @mcp.tool()
-def fetch_price_history(symbol: str, period: str = "1y", interval: str = "1mo") -> dict:
-    try:
-        logger.info(f"Fetching price history for {symbol}")
-        stock = yf.Ticker(symbol)
-        hist = stock.history(period=period, interval=interval)
-        if hist.empty:
-            logger.warning(f"No price history found for {symbol}")
-            return {}
-        return hist.reset_index().to_dict(orient="list")
-    except Exception as e:
-        logger.error(f"Error fetching price history for {symbol}: {e}")
-        return {}
+async def fetch_price_history(symbol: str, period: str = "1y", interval: str = "1mo", format: str = "json") -> dict:
+    """Get price history. format="columnar" returns packed typed columns (see columnar.py) instead of JSON lists."""
+    if format not in columnar.FORMATS:
+        return {"error": f"Unknown format {format!r}, expected one of {', '.join(columnar.FORMATS)}"}
+    if stock_data.PRICE_STORE_DIR:
+        # Served from the mapped series files; columnar payloads are packed from the mapped arrays
+        bars = await upstream.run_blocking("yahoo", stock_data.fetch_price_history_bars, symbol,
+                                           period=period, interval=interval)
+        if format == columnar.FORMAT and bars is not None and len(bars):
+            return columnar.encode_bars(bars)
+        return stock_data.history_payload(bars)
+    history = await upstream.run_cached("yahoo", stock_data.fetch_price_history, symbol, period=period, interval=interval)
+    if format == columnar.FORMAT and history:
+        return columnar.encode_frame(history)
+    return history
 
 @mcp.tool()
-def fetch_quarterly_financials(symbol: str) -> dict:
-    """Get stock quarterly financials."""
-    try:
-        logger.info(f"Fetching quarterly financials for {symbol}")
-        stock = yf.Ticker(symbol)
-        financials = stock.quarterly_financials
-        if financials.empty:
-            logger.warning(f"No quarterly financials found for {symbol}")
-            return {}
-        return financials.to_dict()
-    except Exception as e:
-        logger.error(f"Error fetching quarterly financials for {symbol}: {e}")
-        return {}
+async def fetch_quarterly_financials(symbol: str, metrics: list[str] | None = None, last_n_periods: int | None = None) -> dict:
+    """Get stock quarterly financials. metrics and last_n_periods limit the line items and quarters returned."""
+    financials = await upstream.run_cached("yahoo", stock_data.fetch_quarterly_financials, symbol)
+    return stock_data.project_statement(financials, metrics, last_n_periods, periods_first=True)
 
 @mcp.tool()
-def fetch_annual_financials(symbol: str) -> dict:
-    """Get stock annual financials."""
-    try:
-        logger.info(f"Fetching annual financials for {symbol}")
-        stock = yf.Ticker(symbol)
-        financials = stock.financials
-        if financials.empty:
-            logger.warning(f"No annual financials found for {symbol}")
-            return {}
-        return financials.T.to_dict()
-    except Exception as e:
-        logger.error(f"Error fetching annual financials for {symbol}: {e}")
-        return {}
+async def fetch_annual_financials(symbol: str, metrics: list[str] | None = None, last_n_periods: int | None = None) -> dict:
+    """Get stock annual financials. metrics and last_n_periods limit the line items and years returned."""
+    financials = await upstream.run_cached("yahoo", stock_data.fetch_annual_financials, symbol)
+    return stock_data.project_statement(financials, metrics, last_n_periods)
 
 @mcp.tool()
-def fetch_balance_sheet(symbol: str) -> dict:
-    try:
-        logger.info(f"Fetching balance sheet for {symbol}")
-        stock = yf.Ticker(symbol)
-        balance = stock.balance_sheet
-        if balance.empty:
-            logger.warning(f"No balance sheet found for {symbol}")
-            return {}
-        return balance.T.to_dict()
-    except Exception as e:
-        logger.error(f"Error fetching balance sheet for {symbol}: {e}")
-        return {}
+async def fetch_balance_sheet(symbol: str, metrics: list[str] | None = None, last_n_periods: int | None = None) -> dict:
+    balance = await upstream.run_cached("yahoo", stock_data.fetch_balance_sheet, symbol)
+    return stock_data.project_statement(balance, metrics, last_n_periods)
 
 @mcp.tool()
-def fetch_cash_flow(symbol: str) -> dict:
-    try:
-        logger.info(f"Fetching cash flow for {symbol}")
-        stock = yf.Ticker(symbol)
-        cashflow = stock.cashflow
-        if cashflow.empty:
-            logger.warning(f"No cash flow found for {symbol}")
-            return {}
-        return cashflow.T.to_dict()
-    except Exception as e:
-        logger.error(f"Error fetching cash flow for {symbol}: {e}")
-        return {}
+async def fetch_cash_flow(symbol: str, metrics: list[str] | None = None, last_n_periods: int | None = None) -> dict:
+    cashflow = await upstream.run_cached("yahoo", stock_data.fetch_cash_flow, symbol)
+    return stock_data.project_statement(cashflow, metrics, last_n_periods)
 
 @mcp.tool()
-def get_recommendation(symbol: str) -> dict:
-    """Get Buy/Hold/Sell recommendation using LLM."""
-    try:
-        logger.info(f"Getting recommendation for {symbol}")
-        import json
-        import re
-        # Fetch stock info and annual financials
-        stock = yf.Ticker(symbol)
-        info = stock.info
-        annual = stock.financials.T.to_dict()
-        # Select only key fields for the prompt
-        key_info = {
-            "symbol": info.get("symbol"),
-            "longName": info.get("longName"),
-            "sector": info.get("sector"),
-            "industry": info.get("industry"),
-            "currentPrice": info.get("currentPrice"),
-            "marketCap": info.get("marketCap"),
-            "trailingPE": info.get("trailingPE"),
-            "revenueGrowth": info.get("revenueGrowth"),
-            "dividendYield": info.get("dividendYield"),
-            "beta": info.get("beta"),
-            "fiftyTwoWeekHigh": info.get("fiftyTwoWeekHigh"),
-            "fiftyTwoWeekLow": info.get("fiftyTwoWeekLow"),
-        }
-        # For annual, just send a few key metrics for the last 3 years
-        annual_summary = {}
-        for metric in ["Total Revenue", "Net Income"]:
-            if metric in annual:
-                years = list(annual[metric].keys())[-3:]
-                # Convert keys to strings to avoid serialization errors
-                annual_summary[metric] = {str(k): annual[metric][k] for k in years}
-        prompt = f"""
-        You are a financial analyst. Given the following key stock information and annual financials, provide:
-        1. A one-word recommendation (Buy, Hold, or Sell)
-        2. A detailed analysis explaining your reasoning, including:
-           - Key financial metrics and their implications
-           - Growth trends and market position
-           - Risk factors and market conditions
-           - Competitive advantages or disadvantages
-        
-        Stock Info: {json.dumps(key_info)}
-        Annual Financials (last 3 years): {json.dumps(annual_summary)}
-        
-        Format your response as a JSON object with these fields:
-        {{
-            "recommendation": "Buy/Hold/Sell",
-            "icon": "🟢/🟡/🔴",
-            "reason": "One sentence summary",
-            "detailed_analysis": "A Markdown-formatted bullet list, with each key point on a new line. Use bold for key numbers and italics for highlights."
-        }}
-        Respond with only the JSON object, and nothing else.
-        """
-        # Call OpenAI (new API)
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key:
-            logger.error("OPENAI_API_KEY not set in environment")
-            return {"error": "OPENAI_API_KEY not set in environment."}
-        
-        client = openai.OpenAI(api_key=openai_api_key)
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
-        )
-        result = response.choices[0].message.content
-        # Parse the JSON response
-        try:
-            parsed = json.loads(result)
-            logger.info(f"Successfully got recommendation for {symbol}")
-            return parsed
-        except json.JSONDecodeError:
-            # If JSON parsing fails, try to extract recommendation and reason
-            match = re.search(r'"(Buy|Hold|Sell)"\s*-\s*([^"]+)', result)
-            if match:
-                rec, reason = match.groups()
-                icon = "🟢" if rec == "Buy" else "🟡" if rec == "Hold" else "🔴"
-                logger.warning(f"JSON parsing failed for {symbol}, extracted recommendation manually")
-                return {
-                    "recommendation": rec,
-                    "icon": icon,
-                    "reason": reason.strip(),
-                    "detailed_analysis": "Detailed analysis not available."
-                }
-            logger.error(f"Could not parse recommendation for {symbol}")
-            return {"error": "Could not parse recommendation from response."}
-    except Exception as e:
-        logger.error(f"Error getting recommendation for {symbol}: {e}")
-        return {"error": f"Error getting recommendation: {str(e)}"}
+async def fetch_news(symbol: str, limit: int = 15) -> dict:
+    """Get recent news articles for a stock, newest first, with id, title, link, publisher, published and summary."""
+    news = await upstream.run_cached("yahoo", stock_data.fetch_news, symbol)
+    if not news:
+        return {"symbol": symbol.upper(), "articles": []}
+    return {**news, "articles": news["articles"][:limit]}
+
+@mcp.tool()
+async def fetch_stock_info_batch(symbols: list[str]) -> dict:
+    """Get general information for many companies. Returns per-symbol results and errors."""
+    return await upstream.run_blocking("yahoo", stock_data.fetch_stock_info_batch, symbols)
+
+@mcp.tool()
+async def fetch_price_history_batch(symbols: list[str], period: str = "1y", interval: str = "1mo") -> dict:
+    """Get price history for many symbols in one bulk download. Returns per-symbol results and errors."""
+    return await upstream.run_blocking("yahoo", stock_data.fetch_price_history_batch, symbols, period=period, interval=interval)
+
+@mcp.tool()
+async def fetch_quarterly_financials_batch(symbols: list[str]) -> dict:
+    """Get quarterly financials for many symbols. Returns per-symbol results and errors."""
+    return await upstream.run_blocking("yahoo", stock_data.fetch_quarterly_financials_batch, symbols)
+
+@mcp.tool()
+async def fetch_annual_financials_batch(symbols: list[str]) -> dict:
+    """Get annual financials for many symbols. Returns per-symbol results and errors."""
+    return await upstream.run_blocking("yahoo", stock_data.fetch_annual_financials_batch, symbols)
+
+@mcp.tool()
+async def fetch_balance_sheet_batch(symbols: list[str]) -> dict:
+    """Get balance sheets for many symbols. Returns per-symbol results and errors."""
+    return await upstream.run_blocking("yahoo", stock_data.fetch_balance_sheet_batch, symbols)
+
+@mcp.tool()
+async def fetch_cash_flow_batch(symbols: list[str]) -> dict:
+    """Get cash flow statements for many symbols. Returns per-symbol results and errors."""
+    return await upstream.run_blocking("yahoo", stock_data.fetch_cash_flow_batch, symbols)
+
+@mcp.tool()
+async def screen_stocks(filters: dict[str, dict[str, float]] | None = None, sectors: list[str] | None = None,
+                        sort_by: str = "marketCap", descending: bool = True, limit: int = 50,
+                        fields: list[str] | None = None) -> dict:
+    """Screen the configured universe, e.g. filters={"trailingPE": {"max": 20}, "revenueGrowth": {"min": 0.1}}.
+
+    Bounds are inclusive; symbols missing a filtered field never match. Answered from
+    an index refreshed in the background, so values can be up to SCREENER_MAX_AGE old.
+    """
+    result = screener.screener.index.query(filters, sectors, sort_by, descending, limit, fields)
+    if "error" not in result:
+        result["universe"] = len(screener.screener.universe)
+    return result
+
+@mcp.tool()
+async def fetch_dashboard_bundle(symbol: str, include_recommendation: bool = True, history_format: str = "json",
+                                 info_fields: list[str] | None = None, last_n_periods: int | None = None) -> dict:
+    """Get info, recent price history, all financial statements and optionally the recommendation in one call."""
+    if history_format not in columnar.FORMATS:
+        return {"error": f"Unknown format {history_format!r}, expected one of {', '.join(columnar.FORMATS)}"}
+    # The recommendation reuses the info and annual financials fetched for the bundle
+    jobs = [upstream.run_blocking("yahoo", stock_data.fetch_dashboard_bundle, symbol,
+                                  info_fields=info_fields, last_n_periods=last_n_periods)]
+    if include_recommendation:
+        jobs.append(recommendation.get_recommendation(symbol))
+    results = await asyncio.gather(*jobs)
+    bundle = results[0]
+    if history_format == columnar.FORMAT and bundle["price_history"]:
+        bundle["price_history"] = columnar.encode_frame(bundle["price_history"])
+    if include_recommendation:
+        bundle["recommendation"] = results[1]
+    return bundle
+
+@mcp.tool()
+async def get_cache_stats() -> dict:
+    """Get hit, miss and eviction counters for the tool result cache."""
+    stats = cache.stats()
+    stats["prefetch"] = prefetch.prefetcher.stats()
+    stats["screener"] = screener.screener.stats()
+    stats["price_store"] = stock_data.price_store.stats()
+    return stats
+
+@mcp.tool()
+async def get_upstream_stats() -> dict:
+    """Get queue depth, wait times, token budget and throttling counters for upstream requests."""
+    return upstream.stats()
+
+@mcp.tool()
+async def get_trace(trace_id: str) -> dict:
+    """Get the server-side spans recorded for one trace, for building a request waterfall."""
+    return {"trace_id": trace_id, "spans": tracing.spans(trace_id)}
+
+@mcp.tool()
+async def get_recommendation(symbol: str, refresh: bool = False, ctx: Context = None) -> dict:
+    """Get Buy/Hold/Sell recommendation using LLM. Set refresh to bypass the recommendation cache.
+
+    While the model is generating, partial results are sent as progress
+    notifications whose message is a JSON fragment: {"fields": {...}} or {"analysis": "..."}.
+    """
+    sent = 0
+
+    async def report(fragment):
+        nonlocal sent
+        sent += 1
+        await ctx.report_progress(progress=sent, message=json.dumps(fragment))
+
+    on_fragment = report if ctx is not None else None
+    return await recommendation.get_recommendation(symbol, refresh=refresh, on_fragment=on_fragment)
 
 if __name__ == "__main__":
     try:
         logger.info("Starting MCP server...")
+        cache.warm()
         mcp.run(transport="stdio")
     except Exception as e:
         logger.error(f"Error running MCP server: {e}")
@@ -0,0 +1,200 @@
+import asyncio
+import bisect
+import contextvars
+import logging
+import os
+import resource
+import threading
+import time
+
+import pydantic_core
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Seconds between event-loop lag samples
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.extend(self._render_value(labels, value))
+        return lines
+
+    def _render_value(self, labels, value) -> list:
+        return [f"{self.name}{_format_labels(labels)} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket plus +Inf, then the running sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def _render_value(self, labels, counts) -> list:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts[:-1]):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {counts[-1]}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+tool_calls = Counter("mcp_tool_calls_total", "Tool calls by tool")
+tool_errors = Counter("mcp_tool_errors_total", "Tool calls that raised or returned an error")
+tool_duration = Histogram("mcp_tool_duration_seconds", "Tool call latency including serialization")
+tool_handler_duration = Histogram("mcp_tool_handler_seconds", "Tool call latency excluding result serialization")
+tool_serialization = Histogram("mcp_tool_serialization_seconds", "Time spent serializing the tool result to JSON")
+tool_payload = Histogram("mcp_tool_payload_bytes", "Size of the tool result's text content", SIZE_BUCKETS)
+tools_in_flight = Gauge("mcp_tools_in_flight", "Tool calls currently running")
+upstream_duration = Histogram("upstream_request_duration_seconds", "Upstream request latency, excluding queueing")
+upstream_wait = Histogram("upstream_queue_wait_seconds", "Time spent waiting for admission to an upstream")
+upstream_errors = Counter("upstream_errors_total", "Upstream requests that raised")
+loop_lag = Gauge("event_loop_lag_seconds", "Most recent delay of the event loop beyond a scheduled wakeup")
+loop_lag_histogram = Histogram("event_loop_lag_seconds_distribution", "Event loop delays beyond scheduled wakeups")
+
+_metrics = [
+    tool_calls, tool_errors, tool_duration, tool_handler_duration, tool_serialization, tool_payload,
+    tools_in_flight, upstream_duration, upstream_wait, upstream_errors, loop_lag, loop_lag_histogram,
+]
+
+# Gauges computed on each scrape: () -> [(name, help, {label tuple: value})]
+_collectors = []
+
+
+def register_collector(collect):
+    _collectors.append(collect)
+    return collect
+
+
+def render() -> str:
+    """Return every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        try:
+            samples = collect()
+        except Exception as e:
+            logger.error(f"Error collecting metrics from {collect.__name__}: {e}")
+            continue
+        for name, help, values in samples:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in values.items():
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _resident_memory() -> int:
+    """Current resident set size of this process in bytes, falling back to the peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@register_collector
+def _collect_process():
+    # ru_maxrss is in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return [
+        ("process_resident_memory_bytes", "Resident memory size of the server process", {(): _resident_memory()}),
+        ("process_max_resident_memory_bytes", "Peak resident memory size of the server process", {(): peak}),
+    ]
+
+
+# Filled in by timed_serializer() for the tool call running in this context
+call_timing = contextvars.ContextVar("call_timing", default=None)
+
+
+def timed_serializer(data) -> str:
+    """Default tool result serializer, recording how long it takes for the current tool call."""
+    started = time.perf_counter()
+    with tracing.span("serialize"):
+        text = pydantic_core.to_json(data, fallback=str).decode()
+    timing = call_timing.get()
+    if timing is not None:
+        timing["serialization"] = timing.get("serialization", 0.0) + time.perf_counter() - started
+    return text
+
+
+_lag_task = None
+
+
+def start_loop_monitor():
+    """Start sampling event-loop lag on the running loop, once per process."""
+    global _lag_task
+    if _lag_task is None and LOOP_LAG_INTERVAL > 0:
+        _lag_task = asyncio.ensure_future(_monitor_loop_lag(LOOP_LAG_INTERVAL))
+
+
+async def _monitor_loop_lag(interval: float):
+    while True:
+        scheduled = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - scheduled)
+        loop_lag.set(lag)
+        loop_lag_histogram.observe(lag)
@@ -0,0 +1,145 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+
+import stock_data
+import upstream
+from stock_cache import cache
+from tool_cache import make_key
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated symbols and/or a file with one symbol per line (# starts a comment)
+WATCHLIST = os.getenv("WATCHLIST", "")
+WATCHLIST_FILE = os.getenv("WATCHLIST_FILE", "")
+# Refresh an entry when this fraction of its TTL is left
+PREFETCH_LEAD = float(os.getenv("PREFETCH_LEAD", "0.2"))
+# Minimum seconds between two refreshes, so the watchlist never bursts
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", "0.5"))
+
+# (loader, keyword arguments, dataset) for every entry the dashboard reads
+_JOBS = [
+    (stock_data.fetch_stock_info, {}, "info"),
+    (stock_data.fetch_price_history, {"period": "1y", "interval": "1mo"}, "history"),
+    (stock_data.fetch_quarterly_financials, {}, "statements"),
+    (stock_data.fetch_annual_financials, {}, "statements"),
+    (stock_data.fetch_balance_sheet, {}, "statements"),
+    (stock_data.fetch_cash_flow, {}, "statements"),
+    (stock_data.fetch_news, {}, "news"),
+]
+if stock_data.PRICE_STORE_DIR:
+    # History is served from the shared series files rather than the tool cache, so there is no entry to keep warm
+    _JOBS = [job for job in _JOBS if job[0] is not stock_data.fetch_price_history]
+
+
+def load_watchlist(symbols: str = WATCHLIST, path: str = WATCHLIST_FILE) -> list:
+    """Return the configured watchlist from the env var and file, in order and without duplicates."""
+    entries = symbols.split(",")
+    if path:
+        try:
+            with open(path) as f:
+                for line in f:
+                    entries.extend(line.split("#", 1)[0].replace(",", " ").split())
+        except OSError as e:
+            logger.error(f"Error reading watchlist file {path}: {e}")
+    watchlist = []
+    for symbol in entries:
+        symbol = symbol.strip().upper()
+        if symbol and symbol not in watchlist:
+            watchlist.append(symbol)
+    return watchlist
+
+
+class Prefetcher:
+    """Background thread keeping the watchlist's cache entries warm.
+
+    Each entry is refreshed shortly before its TTL runs out, at most one
+    refresh every PREFETCH_INTERVAL seconds and at background priority, so
+    interactive calls are always served first.
+    """
+
+    def __init__(self, symbols: list, lead: float = PREFETCH_LEAD, interval: float = PREFETCH_INTERVAL):
+        self.symbols = symbols
+        self.lead = lead
+        self.interval = interval
+        self._queue = []
+        self._seq = itertools.count()
+        self._stop = threading.Event()
+        self._thread = None
+        self.refreshes = 0
+        self.errors = 0
+
+    def start(self):
+        if not self.symbols or self._thread is not None:
+            return
+        now = time.monotonic()
+        for symbol in self.symbols:
+            for job in _JOBS:
+                loader, params, dataset = job
+                remaining = cache.expires_in(make_key(loader.__name__, symbol, params))
+                due = now if remaining is None else now + self._refresh_in(remaining, cache.ttl_for(dataset))
+                heapq.heappush(self._queue, (due, next(self._seq), symbol, job))
+        self._check_capacity()
+        logger.info(f"Prefetching {len(self.symbols)} watchlist symbols")
+        self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_in(self, remaining: float, ttl: float) -> float:
+        """Seconds from now until an entry with this much TTL left should be refreshed, with jitter."""
+        lead = ttl * self.lead
+        return max(0.0, remaining - lead * random.uniform(0.5, 1.0))
+
+    def _check_capacity(self):
+        # Refreshes needed per second versus the one-per-interval budget
+        needed = sum(1.0 / (cache.ttl_for(dataset) * (1 - self.lead)) for _, _, dataset in _JOBS) * len(self.symbols)
+        if self.interval > 0 and needed * self.interval > 1:
+            logger.warning(
+                f"Watchlist of {len(self.symbols)} symbols needs {needed:.2f} refreshes/s, "
+                f"but PREFETCH_INTERVAL allows {1 / self.interval:.2f}/s; some entries will expire"
+            )
+
+    def _run(self):
+        with upstream.priority(upstream.BACKGROUND):
+            while self._queue and not self._stop.is_set():
+                due, _, symbol, job = self._queue[0]
+                if self._stop.wait(max(0.0, due - time.monotonic())):
+                    break
+                heapq.heappop(self._queue)
+                self._refresh(symbol, job)
+                loader, params, dataset = job
+                ttl = cache.ttl_for(dataset)
+                remaining = cache.expires_in(make_key(loader.__name__, symbol, params))
+                # Failed or empty fetches are retried on the normal schedule rather than hammered
+                next_due = time.monotonic() + self._refresh_in(remaining if remaining is not None else ttl, ttl)
+                heapq.heappush(self._queue, (next_due, next(self._seq), symbol, job))
+                self._stop.wait(self.interval)
+
+    def _refresh(self, symbol, job):
+        loader, params, dataset = job
+        try:
+            # The undecorated loader, so the entry is replaced rather than served from cache
+            cache.get_or_fetch(loader.__name__, symbol, params, dataset,
+                               lambda: loader.__wrapped__(symbol, **params), refresh=True)
+            self.refreshes += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error prefetching {loader.__name__} for {symbol}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "symbols": len(self.symbols),
+            "scheduled": len(self._queue),
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+        }
+
+
+# Started by the SSE server; idle when no watchlist is configured
+prefetcher = Prefetcher(load_watchlist())
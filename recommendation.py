@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+
+import llm_client
+import stock_data
+import upstream
+from stock_cache import cache
+
+logger = logging.getLogger(__name__)
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4")
+LLM_TEMPERATURE = 0.3
+
+# Numeric prompt inputs are rounded to this many significant figures for the
+# cache key only, so that tick-level moves in price or market cap still hit
+# the recommendation cache while the model sees the exact values
+PROMPT_SIGNIFICANT_FIGURES = int(os.getenv("RECOMMENDATION_SIGNIFICANT_FIGURES", "4"))
+
+
+# Fields of the reply that are sent to the caller as soon as they are complete
+_STREAMED_FIELDS = ("recommendation", "icon", "reason")
+_FIELD_PATTERNS = {
+    name: re.compile(r'"%s"\s*:\s*"((?:[^"\\]|\\.)*)"' % name) for name in _STREAMED_FIELDS
+}
+# Matches the analysis string while it is still being generated
+_ANALYSIS_PATTERN = re.compile(r'"detailed_analysis"\s*:\s*"((?:[^"\\]|\\.)*)')
+
+
+class RecommendationError(Exception):
+    """A failed recommendation, reported to the caller but never cached."""
+
+
+def _unescape(raw: str) -> str:
+    """Decode a JSON string body that may end in an incomplete escape sequence."""
+    while True:
+        try:
+            return json.loads(f'"{raw}"', strict=False)
+        except ValueError:
+            cut = raw.rfind("\\")
+            if cut < 0:
+                return ""
+            raw = raw[:cut]
+
+
+class RecommendationStream:
+    """Turns a partially generated reply into fragments for the caller.
+
+    feed() returns {"fields": {...}} once recommendation, icon or reason are
+    complete, and {"analysis": "..."} with each new piece of detailed_analysis.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._sent_fields = set()
+        self._sent_analysis = 0
+
+    def feed(self, delta: str) -> list:
+        self.text += delta
+        fragments = []
+        fields = {}
+        for name, pattern in _FIELD_PATTERNS.items():
+            if name in self._sent_fields:
+                continue
+            match = pattern.search(self.text)
+            if match:
+                fields[name] = _unescape(match.group(1))
+                self._sent_fields.add(name)
+        if fields:
+            fragments.append({"fields": fields})
+        match = _ANALYSIS_PATTERN.search(self.text)
+        if match:
+            analysis = _unescape(match.group(1))
+            if len(analysis) > self._sent_analysis:
+                fragments.append({"analysis": analysis[self._sent_analysis:]})
+                self._sent_analysis = len(analysis)
+        return fragments
+
+
+def _round_sig(value, figures: int = PROMPT_SIGNIFICANT_FIGURES):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not value or not math.isfinite(value):
+        return value
+    digits = figures - int(math.floor(math.log10(abs(value)))) - 1
+    rounded = round(value, digits)
+    return int(rounded) if isinstance(value, int) else rounded
+
+
+def build_prompt_inputs(info: dict, annual: dict):
+    """Select the key fields and last three years of annual metrics sent to the LLM."""
+    # Select only key fields for the prompt
+    key_info = {
+        "symbol": info.get("symbol"),
+        "longName": info.get("longName"),
+        "sector": info.get("sector"),
+        "industry": info.get("industry"),
+        "currentPrice": info.get("currentPrice"),
+        "marketCap": info.get("marketCap"),
+        "trailingPE": info.get("trailingPE"),
+        "revenueGrowth": info.get("revenueGrowth"),
+        "dividendYield": info.get("dividendYield"),
+        "beta": info.get("beta"),
+        "fiftyTwoWeekHigh": info.get("fiftyTwoWeekHigh"),
+        "fiftyTwoWeekLow": info.get("fiftyTwoWeekLow"),
+    }
+    # For annual, just send a few key metrics for the last 3 years
+    annual_summary = {}
+    for metric in ["Total Revenue", "Net Income"]:
+        if metric in annual:
+            years = list(annual[metric].keys())[-3:]
+            # Convert keys to strings to avoid serialization errors
+            annual_summary[metric] = {str(k): annual[metric][k] for k in years}
+    return key_info, annual_summary
+
+
+def build_prompt(key_info: dict, annual_summary: dict) -> str:
+    return f"""
+        You are a financial analyst. Given the following key stock information and annual financials, provide:
+        1. A one-word recommendation (Buy, Hold, or Sell)
+        2. A detailed analysis explaining your reasoning, including:
+           - Key financial metrics and their implications
+           - Growth trends and market position
+           - Risk factors and market conditions
+           - Competitive advantages or disadvantages
+        
+        Stock Info: {json.dumps(key_info)}
+        Annual Financials (last 3 years): {json.dumps(annual_summary)}
+        
+        Format your response as a JSON object with these fields:
+        {{
+            "recommendation": "Buy/Hold/Sell",
+            "icon": "🟢/🟡/🔴",
+            "reason": "One sentence summary",
+            "detailed_analysis": "A Markdown-formatted bullet list, with each key point on a new line. Use bold for key numbers and italics for highlights."
+        }}
+        Respond with only the JSON object, and nothing else.
+        """
+
+
+def prompt_digest(key_info: dict, annual_summary: dict, model: str = LLM_MODEL,
+                  temperature: float = LLM_TEMPERATURE) -> str:
+    """Content address of an LLM request: the prompt, with its numbers rounded, plus the model parameters."""
+    rounded = {field: _round_sig(value) for field, value in key_info.items()}
+    prompt = build_prompt(rounded, annual_summary)
+    canonical = json.dumps({"model": model, "temperature": temperature, "prompt": prompt}, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def parse_recommendation(symbol: str, result: str) -> dict:
+    """Parse the model's reply, raising RecommendationError when nothing usable is found."""
+    try:
+        parsed = json.loads(result)
+        logger.info(f"Successfully got recommendation for {symbol}")
+        return parsed
+    except json.JSONDecodeError:
+        # If JSON parsing fails, try to extract recommendation and reason
+        match = re.search(r'"(Buy|Hold|Sell)"\s*-\s*([^"]+)', result)
+        if match:
+            rec, reason = match.groups()
+            icon = "🟢" if rec == "Buy" else "🟡" if rec == "Hold" else "🔴"
+            logger.warning(f"JSON parsing failed for {symbol}, extracted recommendation manually")
+            return {
+                "recommendation": rec,
+                "icon": icon,
+                "reason": reason.strip(),
+                "detailed_analysis": "Detailed analysis not available."
+            }
+        logger.error(f"Could not parse recommendation for {symbol}")
+        raise RecommendationError("Could not parse recommendation from response.")
+
+
+async def _ask_llm(symbol: str, prompt: str, api_key: str, on_fragment=None) -> dict:
+    client = llm_client.get_client(api_key)
+    if on_fragment is None:
+        result = await client.complete(prompt, model=LLM_MODEL, temperature=LLM_TEMPERATURE)
+        return parse_recommendation(symbol, result)
+    parser = RecommendationStream()
+    async for delta in client.stream(prompt, model=LLM_MODEL, temperature=LLM_TEMPERATURE):
+        for fragment in parser.feed(delta):
+            if on_fragment is None:
+                continue
+            try:
+                await on_fragment(fragment)
+            except Exception as e:
+                # Progress is a side channel of a fetch other sessions may be waiting on,
+                # so a caller that went away only loses its own fragments
+                logger.warning(f"Stopped streaming recommendation fragments for {symbol}: {e}")
+                on_fragment = None
+    return parse_recommendation(symbol, parser.text)
+
+
+async def get_recommendation(symbol: str, refresh: bool = False, on_fragment=None) -> dict:
+    """Get Buy/Hold/Sell recommendation using LLM.
+
+    Replies are cached under a hash of the prompt and model parameters, so an
+    unchanged company snapshot is answered from the cache. Pass refresh=True
+    to ask the model again. When on_fragment is given, the reply is streamed
+    and on_fragment is awaited with each RecommendationStream fragment.
+    """
+    try:
+        logger.info(f"Getting recommendation for {symbol}")
+        # Fetch stock info and annual financials (shared with the dashboard tools via the cache)
+        info, annual = await asyncio.gather(
+            upstream.run_cached("yahoo", stock_data.fetch_stock_info, symbol),
+            upstream.run_cached("yahoo", stock_data.fetch_annual_financials, symbol),
+        )
+        # The loaders return {} when Yahoo fails; never ask the model about (or cache) an empty snapshot
+        if not info or not info.get("symbol") or info.get("currentPrice") is None or not annual:
+            logger.warning(f"Stock data unavailable for {symbol}, not asking for a recommendation")
+            return {"error": f"Stock data unavailable for {symbol}"}
+        key_info, annual_summary = build_prompt_inputs(info, annual)
+        prompt = build_prompt(key_info, annual_summary)
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+        if not openai_api_key:
+            logger.error("OPENAI_API_KEY not set in environment")
+            return {"error": "OPENAI_API_KEY not set in environment."}
+        return await cache.aget_or_fetch(
+            "get_recommendation", symbol, {"digest": prompt_digest(key_info, annual_summary)}, "recommendation",
+            lambda: _ask_llm(symbol, prompt, openai_api_key, on_fragment), refresh=refresh,
+        )
+    except RecommendationError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        logger.error(f"Error getting recommendation for {symbol}: {e}")
+        return {"error": f"Error getting recommendation: {str(e)}"}
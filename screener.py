@@ -0,0 +1,226 @@
+import heapq
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+import stock_data
+import upstream
+from prefetch import load_watchlist
+
+logger = logging.getLogger(__name__)
+
+# Symbols the screener indexes: comma-separated and/or a file like WATCHLIST_FILE
+SCREENER_UNIVERSE = os.getenv("SCREENER_UNIVERSE", "")
+SCREENER_UNIVERSE_FILE = os.getenv("SCREENER_UNIVERSE_FILE", "")
+# A symbol's row is refreshed once it is older than this many seconds
+SCREENER_MAX_AGE = float(os.getenv("SCREENER_MAX_AGE", "900"))
+# Minimum seconds between two background refreshes
+SCREENER_INTERVAL = float(os.getenv("SCREENER_INTERVAL", "1.0"))
+
+# Numeric info fields kept in the index; the ones get_recommendation uses and a few more
+NUMERIC_FIELDS = (
+    "currentPrice", "marketCap", "trailingPE", "forwardPE", "revenueGrowth", "earningsGrowth",
+    "dividendYield", "beta", "fiftyTwoWeekHigh", "fiftyTwoWeekLow", "profitMargins", "priceToBook",
+    "debtToEquity", "returnOnEquity",
+)
+TEXT_FIELDS = ("longName", "sector", "industry")
+
+
+def _number(value) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return number if np.isfinite(number) else np.nan
+
+
+class ScreenerIndex:
+    """Columnar index of key info fields: one NumPy array per field, one row per symbol.
+
+    Missing values are NaN, so range predicates never match them. Rows are
+    updated in place as fresh info arrives; queries run vectorized over all rows.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._size = 0
+        self.symbols = np.empty(capacity, dtype=object)
+        self.numeric = {field: np.full(capacity, np.nan) for field in NUMERIC_FIELDS}
+        self.text = {field: np.full(capacity, "", dtype=object) for field in TEXT_FIELDS}
+        self.updated = np.zeros(capacity)
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self):
+        capacity = len(self.symbols) * 2
+        self.symbols = np.resize(self.symbols, capacity)
+        for field, column in self.numeric.items():
+            self.numeric[field] = np.concatenate([column, np.full(capacity - len(column), np.nan)])
+        for field, column in self.text.items():
+            self.text[field] = np.concatenate([column, np.full(capacity - len(column), "", dtype=object)])
+        self.updated = np.concatenate([self.updated, np.zeros(capacity - len(self.updated))])
+
+    def update(self, symbol: str, info: dict):
+        """Insert or replace symbol's row from a fetch_stock_info result."""
+        if not info:
+            return
+        symbol = symbol.upper()
+        with self._lock:
+            row = self._rows.get(symbol)
+            if row is None:
+                if self._size == len(self.symbols):
+                    self._grow()
+                row = self._rows[symbol] = self._size
+                self._size += 1
+                self.symbols[row] = symbol
+            for field, column in self.numeric.items():
+                column[row] = _number(info.get(field))
+            for field, column in self.text.items():
+                column[row] = str(info.get(field) or "")
+            self.updated[row] = time.time()
+
+    def age(self, symbol: str):
+        """Seconds since symbol's row was updated, or None when it is not indexed."""
+        with self._lock:
+            row = self._rows.get(symbol.upper())
+            return None if row is None else time.time() - self.updated[row]
+
+    def query(self, filters: dict = None, sectors=None, sort_by: str = "marketCap", descending: bool = True,
+              limit: int = 50, fields=None) -> dict:
+        """Rows matching every {field: {"min": x, "max": y}} bound and one of sectors, sorted by sort_by.
+
+        Bounds are inclusive. Rows with no value for a filtered field never match,
+        and rows with no value for sort_by come last.
+        """
+        filters = filters or {}
+        fields = list(fields) if fields else list(NUMERIC_FIELDS)
+        unknown = [field for field in list(filters) + [sort_by] + fields
+                   if field not in self.numeric and field not in self.text]
+        if unknown:
+            return {"error": f"Unknown fields: {', '.join(dict.fromkeys(unknown))}. "
+                             f"Available: {', '.join(NUMERIC_FIELDS + TEXT_FIELDS)}"}
+        with self._lock:
+            size = self._size
+            mask = np.ones(size, dtype=bool)
+            for field, bounds in filters.items():
+                if field not in self.numeric:
+                    return {"error": f"Only numeric fields can be filtered by range, not {field}"}
+                column = self.numeric[field][:size]
+                if bounds.get("min") is not None:
+                    mask &= column >= bounds["min"]
+                if bounds.get("max") is not None:
+                    mask &= column <= bounds["max"]
+            if sectors:
+                wanted = {sector.lower() for sector in sectors}
+                mask &= np.array([sector.lower() in wanted for sector in self.text["sector"][:size]], dtype=bool)
+            matches = np.flatnonzero(mask)
+            if sort_by in self.numeric:
+                keys = self.numeric[sort_by][matches]
+                # NaN sorts last either way
+                order = np.argsort(-keys if descending else keys, kind="stable")
+            else:
+                order = np.argsort(self.text[sort_by][matches], kind="stable")
+                if descending:
+                    order = order[::-1]
+            rows = matches[order][:max(0, limit)]
+            results = []
+            for row in rows:
+                result = {"symbol": self.symbols[row]}
+                for field in fields:
+                    if field in self.numeric:
+                        value = self.numeric[field][row]
+                        result[field] = None if np.isnan(value) else float(value)
+                    else:
+                        result[field] = self.text[field][row]
+                results.append(result)
+        return {"matches": results, "total_matches": int(len(matches)), "indexed": size}
+
+
+class Screener:
+    """Keeps the index filled for a universe of symbols.
+
+    A background thread refreshes the stalest symbol whenever it is older
+    than SCREENER_MAX_AGE, at most once every SCREENER_INTERVAL seconds and
+    at background priority. Info fetched by interactive tool calls is fed in
+    through observe(), so popular symbols stay fresh without extra requests.
+    """
+
+    def __init__(self, universe: list, max_age: float = SCREENER_MAX_AGE, interval: float = SCREENER_INTERVAL):
+        self.universe = universe
+        self._members = set(universe)
+        self.max_age = max_age
+        self.interval = interval
+        self.index = ScreenerIndex()
+        self._stop = threading.Event()
+        self._thread = None
+        self.refreshes = 0
+        self.errors = 0
+
+    def start(self):
+        if not self.universe or self._thread is not None:
+            return
+        logger.info(f"Indexing {len(self.universe)} symbols for the screener")
+        # One refresh per interval has to get round the whole universe within max_age
+        if len(self.universe) * self.interval > self.max_age:
+            logger.warning(
+                f"Screener universe of {len(self.universe)} symbols needs {len(self.universe) / self.max_age:.2f} "
+                f"refreshes/s, but SCREENER_INTERVAL allows {1 / self.interval:.2f}/s; rows will be older than "
+                f"SCREENER_MAX_AGE"
+            )
+        self._thread = threading.Thread(target=self._run, name="screener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def observe(self, symbol: str, info: dict):
+        """Index info fetched elsewhere when symbol belongs to the universe."""
+        if symbol.upper() in self._members:
+            self.index.update(symbol, info)
+
+    def _run(self):
+        # (due, position, symbol): never-indexed symbols first, in universe order
+        queue = [(0.0, position, symbol) for position, symbol in enumerate(self.universe)]
+        with upstream.priority(upstream.BACKGROUND):
+            while queue and not self._stop.is_set():
+                due, position, symbol = queue[0]
+                age = self.index.age(symbol)
+                # Rows refreshed through observe() in the meantime push the due time back
+                if age is not None and age < self.max_age:
+                    heapq.heapreplace(queue, (time.time() + self.max_age - age, position, symbol))
+                    continue
+                if self._stop.wait(max(0.0, due - time.time())):
+                    break
+                self._refresh(symbol)
+                heapq.heapreplace(queue, (time.time() + self.max_age, position, symbol))
+                self._stop.wait(self.interval)
+
+    def _refresh(self, symbol: str):
+        try:
+            # The undecorated loader, so the sweep neither fills nor skews the shared tool cache
+            info = stock_data.fetch_stock_info.__wrapped__(symbol)
+        except Exception as e:
+            info = {}
+            logger.error(f"Error indexing {symbol} for the screener: {e}")
+        if info:
+            self.index.update(symbol, info)
+            self.refreshes += 1
+        else:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        return {
+            "universe": len(self.universe),
+            "indexed": len(self.index),
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+        }
+
+
+# Started by the SSE server; idle when no universe is configured
+screener = Screener(load_watchlist(SCREENER_UNIVERSE, SCREENER_UNIVERSE_FILE))
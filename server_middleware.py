@@ -0,0 +1,70 @@
+import time
+import weakref
+
+from fastmcp.server.middleware import Middleware
+
+import metrics
+import tracing
+
+# FastMCP middleware for the MCP servers. Kept out of metrics.py and
+# tracing.py so the dashboards can import those without the server packages.
+
+
+class TracingMiddleware(Middleware):
+    """Runs each tool call in a span, continuing the caller's trace when it sends a traceparent in _meta."""
+
+    async def on_call_tool(self, context, call_next):
+        # FastMCP rebuilds the tool call params without _meta; it is kept on the request context
+        meta = context.message.meta
+        if meta is None and context.fastmcp_context is not None:
+            try:
+                meta = context.fastmcp_context.request_context.meta
+            except Exception:
+                meta = None
+        parent = tracing.parse_traceparent(getattr(meta, "traceparent", None))
+        with tracing.span(f"tool {context.message.name}", parent=parent):
+            return await call_next(context)
+
+
+class MetricsMiddleware(Middleware):
+    """Records per-tool counts, errors, latency and payload size, and tracks connected sessions."""
+
+    def __init__(self):
+        self._sessions = weakref.WeakSet()
+        metrics.register_collector(self._collect_sessions)
+
+    async def on_message(self, context, call_next):
+        try:
+            self._sessions.add(context.fastmcp_context.session)
+        except Exception:
+            pass
+        return await call_next(context)
+
+    async def on_call_tool(self, context, call_next):
+        tool = context.message.name
+        timing = {}
+        token = metrics.call_timing.set(timing)
+        metrics.tools_in_flight.inc(tool=tool)
+        started = time.perf_counter()
+        try:
+            result = await call_next(context)
+        except Exception:
+            metrics.tool_errors.inc(tool=tool)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.tools_in_flight.dec(tool=tool)
+            metrics.tool_calls.inc(tool=tool)
+            metrics.tool_duration.observe(elapsed, tool=tool)
+            metrics.call_timing.reset(token)
+            serialization = timing.get("serialization", 0.0)
+            metrics.tool_serialization.observe(serialization, tool=tool)
+            metrics.tool_handler_duration.observe(max(0.0, elapsed - serialization), tool=tool)
+        texts = [block.text for block in result.content if getattr(block, "type", None) == "text"]
+        metrics.tool_payload.observe(sum(len(text.encode()) for text in texts), tool=tool)
+        if any(text.startswith('{"error"') for text in texts):
+            metrics.tool_errors.inc(tool=tool)
+        return result
+
+    def _collect_sessions(self):
+        return [("mcp_sessions_connected", "MCP sessions with a live connection", {(): len(self._sessions)})]
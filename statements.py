@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+
+# Numeric analytics over financial statements as returned by the statement
+# tools ({metric: {period: value}}). Statements for any number of symbols are
+# stacked into one float frame, indexed by (symbol, metric) with one column
+# per calendar year, and every calculation below runs on that frame as a whole.
+# Values are only turned into strings by the format_* helpers at the edge.
+
+SYMBOL = "symbol"
+METRIC = "metric"
+
+
+def _year(period):
+    """Calendar year of a period key: a timestamp or an ISO date string."""
+    if hasattr(period, "year"):
+        return period.year
+    text = str(period)
+    if len(text) >= 5 and text[:4].isdigit() and text[4] == "-":
+        return int(text[:4])
+    try:
+        return pd.Timestamp(text).year
+    except (TypeError, ValueError):
+        return None
+
+
+def _stack(rows: list, index) -> pd.DataFrame:
+    """Build the float frame for rows of {period: value}, one column per year, ascending."""
+    periods = list(dict.fromkeys(period for values in rows for period in values))
+    try:
+        data = np.array([[values.get(period) for period in periods] for values in rows], dtype=float)
+    except (TypeError, ValueError):
+        data = pd.DataFrame(rows, columns=periods).apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    data = data.reshape(len(rows), len(periods))
+    result = pd.DataFrame(data, index=index, columns=[_year(period) for period in periods])
+    result = result.loc[:, result.columns.notna()]
+    # Two periods in the same year (e.g. a changed fiscal year end): keep the later value
+    if result.columns.has_duplicates:
+        result = result.T.groupby(level=0).last().T
+    result.columns = result.columns.astype(int)
+    return result.sort_index(axis=1)
+
+
+def statement_frame(statement: dict, metrics=None) -> pd.DataFrame:
+    """One statement as a float frame indexed by metric, one column per year.
+
+    Rows follow the order of metrics when given; missing metrics and line
+    items that are not dicts are left out, and non-numeric values become NaN.
+    """
+    statement = statement if isinstance(statement, dict) else {}
+    names = metrics if metrics else list(statement)
+    names = [metric for metric in names if isinstance(statement.get(metric), dict)]
+    return _stack([statement[metric] for metric in names], pd.Index(names, name=METRIC))
+
+
+def frame(statements: dict, metrics=None) -> pd.DataFrame:
+    """Stack {symbol: statement} into a float frame indexed by (symbol, metric), one column per year.
+
+    Periods are aligned by calendar year so symbols with different fiscal
+    year ends line up. Line items that are not dicts are skipped, and
+    values that are not numbers become NaN.
+    """
+    keys, rows = [], []
+    for symbol, statement in statements.items():
+        if not isinstance(statement, dict):
+            continue
+        for metric, values in statement.items():
+            if isinstance(values, dict) and (not metrics or metric in metrics):
+                keys.append((symbol, metric))
+                rows.append(values)
+    return _stack(rows, pd.MultiIndex.from_tuples(keys, names=[SYMBOL, METRIC]))
+
+
+def _finite(result: pd.DataFrame) -> pd.DataFrame:
+    return result.replace([np.inf, -np.inf], np.nan)
+
+
+def yoy(values: pd.DataFrame) -> pd.DataFrame:
+    """Year-over-year change in percent for every row and year; NaN for the first year."""
+    previous = values.shift(1, axis=1)
+    return _finite((values - previous) / previous.abs() * 100)
+
+
+def cagr(values: pd.DataFrame, years: int = None) -> pd.Series:
+    """Compound annual growth in percent between the last year and `years` earlier (default: the first year).
+
+    NaN where either end is missing or not positive.
+    """
+    years = values.shape[1] - 1 if years is None else min(years, values.shape[1] - 1)
+    if years < 1:
+        return pd.Series(np.nan, index=values.index)
+    first, last = values.iloc[:, -1 - years], values.iloc[:, -1]
+    valid = (first > 0) & (last > 0)
+    growth = (last.where(valid) / first.where(valid)) ** (1 / years) - 1
+    return growth * 100
+
+
+def ratios(values: pd.DataFrame, definitions: dict) -> pd.DataFrame:
+    """Compute {name: (numerator metric, denominator metric)} for every symbol and year at once.
+
+    Returns a frame indexed by (symbol, name); NaN where either metric is missing.
+    """
+    available = set(values.index.get_level_values(METRIC))
+    parts = {}
+    for name, (numerator, denominator) in definitions.items():
+        if numerator not in available or denominator not in available:
+            continue
+        parts[name] = values.xs(numerator, level=METRIC) / values.xs(denominator, level=METRIC)
+    if not parts:
+        return pd.DataFrame(index=pd.MultiIndex.from_tuples([], names=[SYMBOL, METRIC]), columns=values.columns)
+    result = pd.concat(parts, names=[METRIC]).swaplevel(0, 1).sort_index()
+    return _finite(result)
+
+
+def margins(values: pd.DataFrame, numerators, denominator: str = "Total Revenue") -> pd.DataFrame:
+    """Each numerator metric as a percent of the denominator, per symbol and year."""
+    return ratios(values, {f"{metric} Margin": (metric, denominator) for metric in numerators}) * 100
+
+
+def summary(values: pd.DataFrame, years: int = 3) -> pd.DataFrame:
+    """The last `years` years plus YoY (%) of the latest year and CAGR (%) over the shown years."""
+    shown = values.iloc[:, -years:]
+    result = shown.copy()
+    result["YoY (%)"] = yoy(shown).iloc[:, -1] if shown.shape[1] > 1 else np.nan
+    result["CAGR (%)"] = cagr(shown)
+    return result
+
+
+def format_money(values, scale: float = 1e9, prefix: str = "$", decimals: int = 2) -> np.ndarray:
+    """Format numbers as prefix + value / scale; NaN becomes an empty string."""
+    array = np.asarray(values, dtype=float)
+    text = np.char.mod(f"{prefix}%.{decimals}f", np.nan_to_num(array / scale))
+    return np.where(np.isnan(array), "", text)
+
+
+def format_percent(values, decimals: int = 1) -> np.ndarray:
+    """Format percentages with a sign, e.g. +12.3%; NaN becomes an empty string."""
+    array = np.asarray(values, dtype=float)
+    text = np.char.mod(f"%+.{decimals}f%%", np.nan_to_num(array))
+    return np.where(np.isnan(array), "", text)
+
+
+def fin_table(statement: dict, metrics: list, display_names: list, years: int = 3) -> pd.DataFrame:
+    """The dashboard's statement table: Metric, the last `years` years in $B, and YoY (%).
+
+    Rows follow the order of metrics; metrics missing from the statement are left out.
+    """
+    values = statement_frame(statement, metrics)
+    names = dict(zip(metrics, display_names))
+    shown = values.iloc[:, -years:]
+    array = shown.to_numpy()
+    columns = {"Metric": [names[metric] for metric in shown.index]}
+    for position, year in enumerate(shown.columns):
+        columns[str(year)] = format_money(array[:, position])
+    if array.shape[1] > 1:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = (array[:, -1] - array[:, -2]) / np.abs(array[:, -2]) * 100
+        change[~np.isfinite(change)] = np.nan
+    else:
+        change = np.full(len(array), np.nan)
+    columns["YoY (%)"] = format_percent(change)
+    return pd.DataFrame(columns)
+
+
+def comparison_table(statements: dict, metrics: list, years: int = 3) -> pd.DataFrame:
+    """A display table comparing metrics across symbols: one row per (symbol, metric)."""
+    result = summary(frame(statements, metrics), years)
+    table = pd.DataFrame(index=result.index)
+    for column in result.columns:
+        if column in ("YoY (%)", "CAGR (%)"):
+            table[column] = format_percent(result[column])
+        else:
+            table[str(column)] = format_money(result[column])
+    return table.reset_index()
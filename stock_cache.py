@@ -0,0 +1,7 @@
+import upstream
+from tool_cache import ToolCache
+
+# Process-wide cache shared by every tool, opened by the server processes only;
+# clients import tool_cache, which has no import-time side effects.
+# Early refreshes run at background priority on the upstreams.
+cache = ToolCache.from_env(background=lambda: upstream.priority(upstream.BACKGROUND))
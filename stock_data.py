@@ -0,0 +1,643 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+import yfinance as yf
+
+import barfile
+import upstream
+from stock_cache import cache
+from tool_cache import make_key
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on concurrent per-symbol fetches made by one batch call
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "8"))
+
+# Articles remembered per symbol across news fetches, and symbols remembered
+NEWS_MAX_ARTICLES = int(os.getenv("NEWS_MAX_ARTICLES", "50"))
+NEWS_MAX_SYMBOLS = int(os.getenv("NEWS_MAX_SYMBOLS", "1000"))
+
+# (symbol, interval) price series kept for incremental history fetches
+PRICE_STORE_MAX_SERIES = int(os.getenv("PRICE_STORE_MAX_SERIES", "256"))
+# Directory for memory-mapped price series files; series stay on the heap when unset
+PRICE_STORE_DIR = os.getenv("PRICE_STORE_DIR", "")
+
+
+# Readers shared by the single-symbol and batch loaders. They return {} when
+# Yahoo has no data, let exceptions propagate to the caller and each hold one
+# Yahoo concurrency slot while they run.
+@upstream.limited("yahoo")
+def _read_stock_info(stock) -> dict:
+    return stock.info or {}
+
+
+@upstream.limited("yahoo")
+def _read_bars(stock, interval: str, period: str = None, start=None) -> pd.DataFrame:
+    if start is not None:
+        return stock.history(start=start, interval=interval)
+    return stock.history(period=period, interval=interval)
+
+
+@upstream.limited("yahoo")
+def _read_quarterly_financials(stock) -> dict:
+    financials = stock.quarterly_financials
+    return {} if financials.empty else financials.to_dict()
+
+
+@upstream.limited("yahoo")
+def _read_annual_financials(stock) -> dict:
+    financials = stock.financials
+    return {} if financials.empty else financials.T.to_dict()
+
+
+@upstream.limited("yahoo")
+def _read_balance_sheet(stock) -> dict:
+    balance = stock.balance_sheet
+    return {} if balance.empty else balance.T.to_dict()
+
+
+@upstream.limited("yahoo")
+def _read_cash_flow(stock) -> dict:
+    cashflow = stock.cashflow
+    return {} if cashflow.empty else cashflow.T.to_dict()
+
+
+@upstream.limited("yahoo")
+def _read_news(stock) -> list:
+    return stock.news or []
+
+
+@cache.cached("info")
+def fetch_stock_info(symbol: str) -> dict:
+    """Get Company's general information."""
+    try:
+        logger.info(f"Fetching stock info for {symbol}")
+        info = _read_stock_info(yf.Ticker(symbol))
+        if not info:
+            logger.warning(f"No info found for {symbol}")
+            return {}
+        return info
+    except Exception as e:
+        logger.error(f"Error fetching stock info for {symbol}: {e}")
+        return {}
+
+
+# Periods yfinance accepts, as offsets back from the latest bar; day periods count trading days
+_PERIOD_OFFSETS = {
+    "1mo": pd.DateOffset(months=1), "3mo": pd.DateOffset(months=3), "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1), "2y": pd.DateOffset(years=2), "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+}
+_DAY_PERIODS = {"1d": 1, "5d": 5}
+_ACTIONS = ("Dividends", "Stock Splits")
+
+
+def _period_start(bars: barfile.Bars, period: str):
+    """First timestamp of period, counted back from the latest of bars; None for max."""
+    if period == "max":
+        return None
+    last = bars.last
+    if period == "ytd":
+        return last.normalize().replace(month=1, day=1)
+    if period in _DAY_PERIODS:
+        day = last.normalize()
+        for _ in range(_DAY_PERIODS[period] - 1):
+            position = bars.search(day)
+            if position == 0:
+                break
+            day = bars.timestamp(position - 1).normalize()
+        return day
+    return last - _PERIOD_OFFSETS[period]
+
+
+def _has_actions(bars: pd.DataFrame) -> bool:
+    columns = [column for column in _ACTIONS if column in bars]
+    return bool(columns) and bool(bars[columns].fillna(0).to_numpy().any())
+
+
+def _file_name(symbol: str, interval: str) -> str:
+    return re.sub(r"[^A-Za-z0-9.=^-]", "_", f"{symbol}_{interval}") + ".bars"
+
+
+class PriceStore:
+    """Bars kept per (symbol, interval), so each fetch only downloads what is new.
+
+    The first request for a series downloads its period. Later requests
+    download from the latest stored bar on, replace that bar (it may have
+    still been open) and append the rest; any period the stored bars cover
+    is then sliced locally, counted back from the latest bar. A dividend or
+    split among the new bars rescales Yahoo's adjusted prices, so it
+    triggers a full download instead of a merge.
+
+    A series checked within max_age seconds (the history TTL by default)
+    is served without asking Yahoo at all.
+
+    With a directory, each series lives in a barfile that the store maps
+    instead of holding it on the heap. Server processes sharing the
+    directory share the pages and pick up each other's downloads.
+    """
+
+    def __init__(self, max_series: int = PRICE_STORE_MAX_SERIES, directory: str = PRICE_STORE_DIR,
+                 max_age: float = None):
+        self.max_series = max_series
+        self.directory = directory
+        self.max_age = cache.ttl_for("history") if max_age is None else max_age
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+        self.full_fetches = 0
+        self.delta_fetches = 0
+
+    def _entry(self, key: tuple) -> dict:
+        with self._lock:
+            entry = self._series.pop(key, None)
+            if entry is None:
+                # checked: wall time the series was last brought up to date
+                entry = {"lock": threading.Lock(), "bars": None, "checked": 0.0}
+            self._series[key] = entry
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        return entry
+
+    def _path(self, key: tuple) -> str:
+        return os.path.join(self.directory, _file_name(*key))
+
+    def _sync(self, entry: dict, key: tuple):
+        """Map the series' file when it is new or another process has replaced it."""
+        state = barfile.file_state(self._path(key))
+        if state is None or (entry["bars"] is not None and entry["bars"].source == state):
+            return
+        try:
+            entry["bars"] = barfile.read(self._path(key))
+            # Every update rewrites the file, so its mtime is when some process last checked the series
+            entry["checked"] = state[1] / 1e9
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading stored bars for {key[0]}: {e}")
+
+    def _save(self, entry: dict, key: tuple, bars: barfile.Bars):
+        entry["bars"] = bars
+        if not self.directory:
+            return
+        try:
+            barfile.write(self._path(key), bars)
+            entry["bars"] = barfile.read(self._path(key))
+        except (OSError, ValueError) as e:
+            # Keep serving the bars from memory
+            logger.error(f"Error storing bars for {key[0]}: {e}")
+
+    @staticmethod
+    def _covers(bars: barfile.Bars, period: str) -> bool:
+        if bars is None or not len(bars):
+            return False
+        if bars.meta["period"] == "max":
+            return True
+        start = _period_start(bars, period)
+        return start is not None and bars.meta["covered_from"] <= bars.ns(start)
+
+    def _download(self, entry: dict, key: tuple, stock, period: str):
+        frame = _read_bars(stock, key[1], period=period)
+        self.full_fetches += 1
+        entry["checked"] = time.time()
+        if frame.empty:
+            entry["bars"] = None
+            return
+        bars = barfile.Bars.from_frame(frame)
+        start = _period_start(bars, period)
+        # period: the widest full download; covered_from: where it started (None for max)
+        bars.meta = {"period": period, "covered_from": None if start is None else bars.ns(start)}
+        self._save(entry, key, bars)
+
+    def _update(self, entry: dict, key: tuple, stock):
+        bars = entry["bars"]
+        last = bars.last
+        new = _read_bars(stock, key[1], start=last)
+        self.delta_fetches += 1
+        entry["checked"] = time.time()
+        if new.empty:
+            return
+        if _has_actions(new[new.index > last]):
+            logger.info(f"Corporate action in new bars for {key[0]}, downloading {bars.meta['period']} again")
+            self._download(entry, key, stock, bars.meta["period"])
+            return
+        merged = pd.concat([bars.slice(end=new.index[0]).to_frame(), new])
+        self._save(entry, key, barfile.Bars.from_frame(merged, bars.meta))
+
+    def bars(self, symbol: str, period: str, interval: str, stock=None):
+        """Bars for period, as views over the stored series; None when Yahoo has none."""
+        stock = stock or yf.Ticker(symbol)
+        if period != "max" and period != "ytd" and period not in _DAY_PERIODS and period not in _PERIOD_OFFSETS:
+            # Periods the store cannot slice go straight to Yahoo
+            frame = _read_bars(stock, interval, period=period)
+            return None if frame.empty else barfile.Bars.from_frame(frame)
+        key = (symbol.upper(), interval)
+        entry = self._entry(key)
+        with entry["lock"]:
+            if self.directory:
+                self._sync(entry, key)
+            if not self._covers(entry["bars"], period):
+                self._download(entry, key, stock, period)
+            elif time.time() - entry["checked"] >= self.max_age:
+                self._update(entry, key, stock)
+            bars = entry["bars"]
+        if bars is None:
+            return None
+        start = _period_start(bars, period)
+        # A binary search on the timestamps; the slice is a view, nothing is copied
+        return bars if start is None else bars.slice(start)
+
+    def history(self, symbol: str, period: str, interval: str, stock=None) -> dict:
+        """Price history for period as a to_dict(orient="list") payload; {} when Yahoo has none."""
+        return history_payload(self.bars(symbol, period, interval, stock))
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stored = [entry["bars"] for entry in self._series.values() if entry["bars"] is not None]
+        return {
+            "series": len(self._series),
+            "full_fetches": self.full_fetches,
+            "delta_fetches": self.delta_fetches,
+            "bytes": sum(bars.nbytes for bars in stored),
+            "mapped": sum(bars.source is not None for bars in stored),
+        }
+
+
+price_store = PriceStore()
+
+
+def history_payload(bars) -> dict:
+    """Bars as a to_dict(orient="list") payload with the index as the first column; {} for none."""
+    if bars is None or not len(bars):
+        return {}
+    return bars.to_frame().reset_index().to_dict(orient="list")
+
+
+def fetch_price_history_bars(symbol: str, period: str = "1y", interval: str = "1mo"):
+    """Price history as barfile.Bars, mapped from PRICE_STORE_DIR when set; None when there is none."""
+    try:
+        logger.info(f"Fetching price history for {symbol}")
+        bars = price_store.bars(symbol, period, interval)
+        if bars is None:
+            logger.warning(f"No price history found for {symbol}")
+        return bars
+    except Exception as e:
+        logger.error(f"Error fetching price history for {symbol}: {e}")
+        return None
+
+
+def fetch_price_history(symbol: str, period: str = "1y", interval: str = "1mo") -> dict:
+    return history_payload(fetch_price_history_bars(symbol, period, interval))
+
+
+if not PRICE_STORE_DIR:
+    # With PRICE_STORE_DIR set, history is served from the shared mapped files
+    # instead of keeping (and persisting) a payload copy per process
+    fetch_price_history = cache.cached("history")(fetch_price_history)
+
+
+@cache.cached("statements")
+def fetch_quarterly_financials(symbol: str) -> dict:
+    """Get stock quarterly financials."""
+    try:
+        logger.info(f"Fetching quarterly financials for {symbol}")
+        financials = _read_quarterly_financials(yf.Ticker(symbol))
+        if not financials:
+            logger.warning(f"No quarterly financials found for {symbol}")
+        return financials
+    except Exception as e:
+        logger.error(f"Error fetching quarterly financials for {symbol}: {e}")
+        return {}
+
+
+@cache.cached("statements")
+def fetch_annual_financials(symbol: str) -> dict:
+    """Get stock annual financials."""
+    try:
+        logger.info(f"Fetching annual financials for {symbol}")
+        financials = _read_annual_financials(yf.Ticker(symbol))
+        if not financials:
+            logger.warning(f"No annual financials found for {symbol}")
+        return financials
+    except Exception as e:
+        logger.error(f"Error fetching annual financials for {symbol}: {e}")
+        return {}
+
+
+@cache.cached("statements")
+def fetch_balance_sheet(symbol: str) -> dict:
+    try:
+        logger.info(f"Fetching balance sheet for {symbol}")
+        balance = _read_balance_sheet(yf.Ticker(symbol))
+        if not balance:
+            logger.warning(f"No balance sheet found for {symbol}")
+        return balance
+    except Exception as e:
+        logger.error(f"Error fetching balance sheet for {symbol}: {e}")
+        return {}
+
+
+@cache.cached("statements")
+def fetch_cash_flow(symbol: str) -> dict:
+    try:
+        logger.info(f"Fetching cash flow for {symbol}")
+        cashflow = _read_cash_flow(yf.Ticker(symbol))
+        if not cashflow:
+            logger.warning(f"No cash flow found for {symbol}")
+        return cashflow
+    except Exception as e:
+        logger.error(f"Error fetching cash flow for {symbol}: {e}")
+        return {}
+
+
+def slim_article(article: dict) -> dict:
+    """Reduce a Yahoo news item to the fields the news card renders.
+
+    Handles both the nested {"content": {...}} items of newer yfinance
+    releases and the flat items of older ones. Returns {} without an id or title.
+    """
+    content = article.get("content") or article
+    published = content.get("pubDate") or content.get("providerPublishTime")
+    if isinstance(published, (int, float)):
+        published = pd.Timestamp(published, unit="s", tz="UTC").isoformat()
+    provider = content.get("provider")
+    link = content.get("link")
+    for url_key in ("canonicalUrl", "clickThroughUrl"):
+        if not link and isinstance(content.get(url_key), dict):
+            link = content[url_key].get("url")
+    slim = {
+        "id": article.get("id") or content.get("id") or article.get("uuid"),
+        "title": content.get("title"),
+        "link": link or "",
+        "publisher": provider.get("displayName", "") if isinstance(provider, dict) else content.get("publisher", ""),
+        "published": published or "",
+        "summary": content.get("summary") or content.get("description") or "",
+    }
+    return slim if slim["id"] and slim["title"] else {}
+
+
+class NewsFeed:
+    """Articles seen per symbol, so each fetch only adds what is new.
+
+    Yahoo returns a short list of the latest items; merging keeps older
+    articles that have dropped off it, deduplicated by id, newest first.
+    """
+
+    def __init__(self, max_articles: int = NEWS_MAX_ARTICLES, max_symbols: int = NEWS_MAX_SYMBOLS):
+        self.max_articles = max_articles
+        self.max_symbols = max_symbols
+        self._feeds = OrderedDict()
+        self._lock = threading.Lock()
+
+    def merge(self, symbol: str, items: list) -> tuple:
+        """Add items to symbol's feed and return (articles newest first, number of new articles)."""
+        symbol = symbol.upper()
+        with self._lock:
+            feed = self._feeds.pop(symbol, {})
+            new = 0
+            for item in items:
+                article = slim_article(item)
+                if article and article["id"] not in feed:
+                    feed[article["id"]] = article
+                    new += 1
+            articles = sorted(feed.values(), key=lambda article: article["published"], reverse=True)
+            articles = articles[:self.max_articles]
+            self._feeds[symbol] = {article["id"]: article for article in articles}
+            while len(self._feeds) > self.max_symbols:
+                self._feeds.popitem(last=False)
+        return articles, new
+
+
+news_feed = NewsFeed()
+
+
+@cache.cached("news")
+def fetch_news(symbol: str) -> dict:
+    """Get recent news for a symbol, merged with the articles seen on earlier fetches."""
+    try:
+        logger.info(f"Fetching news for {symbol}")
+        articles, new = news_feed.merge(symbol, _read_news(yf.Ticker(symbol)))
+        logger.info(f"{new} new articles for {symbol}")
+        if not articles:
+            return {}
+        return {"symbol": symbol.upper(), "articles": articles}
+    except Exception as e:
+        logger.error(f"Error fetching news for {symbol}: {e}")
+        return {}
+
+
+def project_info(info: dict, fields=None) -> dict:
+    """Keep only the requested info keys; all of them when fields is empty."""
+    if not fields:
+        return info
+    return {field: info[field] for field in fields if field in info}
+
+
+def project_statement(statement: dict, metrics=None, last_n_periods=None, periods_first: bool = False) -> dict:
+    """Keep only the requested line items and the most recent periods of a statement.
+
+    Statements are {metric: {period: value}}, or {period: {metric: value}}
+    when periods_first is set (quarterly financials).
+    """
+    if not statement or (not metrics and not last_n_periods):
+        return statement
+    by_period = statement if periods_first else {}
+    if not periods_first:
+        for metric, values in statement.items():
+            for period, value in (values or {}).items():
+                by_period.setdefault(period, {})[metric] = value
+    periods = sorted(by_period, reverse=True)
+    if last_n_periods:
+        periods = periods[:last_n_periods]
+    periods = sorted(periods)
+    if periods_first:
+        return {
+            period: {metric: value for metric, value in by_period[period].items() if not metrics or metric in metrics}
+            for period in periods
+        }
+    return {
+        metric: {period: values[period] for period in periods if period in values}
+        for metric, values in statement.items()
+        if (not metrics or metric in metrics) and values
+    }
+
+
+def _normalize_symbols(symbols) -> list:
+    """Upper-case symbols and drop blanks and duplicates, keeping the caller's order."""
+    seen = []
+    for symbol in symbols:
+        symbol = symbol.strip().upper()
+        if symbol and symbol not in seen:
+            seen.append(symbol)
+    return seen
+
+
+def _fetch_batch(tool: str, dataset: str, reader, symbols) -> dict:
+    """Fetch one dataset for many symbols over a shared yf.Tickers session.
+
+    Each symbol goes through the same cache entry as the single-symbol tool,
+    so batch and single calls share results and in-flight fetches.
+    """
+    symbols = _normalize_symbols(symbols)
+    results, errors = {}, {}
+    if not symbols:
+        return {"results": results, "errors": errors}
+    logger.info(f"Batch {tool} for {len(symbols)} symbols")
+    tickers = yf.Tickers(" ".join(symbols))
+
+    def fetch_one(symbol):
+        return cache.get_or_fetch(tool, symbol, {}, dataset, lambda: reader(tickers.tickers[symbol]))
+
+    # Batch work yields to interactive calls in the Yahoo scheduler
+    with upstream.priority(upstream.BATCH):
+        futures = upstream.fan_out(fetch_one, symbols, limit=BATCH_MAX_WORKERS)
+        for symbol, future in futures.items():
+            try:
+                value = future.result()
+            except Exception as e:
+                logger.error(f"Error in batch {tool} for {symbol}: {e}")
+                errors[symbol] = str(e)
+                continue
+            if value:
+                results[symbol] = value
+            else:
+                errors[symbol] = f"No data found for {symbol}"
+    return {"results": results, "errors": errors}
+
+
+def fetch_stock_info_batch(symbols: list) -> dict:
+    return _fetch_batch("fetch_stock_info", "info", _read_stock_info, symbols)
+
+
+def fetch_quarterly_financials_batch(symbols: list) -> dict:
+    return _fetch_batch("fetch_quarterly_financials", "statements", _read_quarterly_financials, symbols)
+
+
+def fetch_annual_financials_batch(symbols: list) -> dict:
+    return _fetch_batch("fetch_annual_financials", "statements", _read_annual_financials, symbols)
+
+
+def fetch_balance_sheet_batch(symbols: list) -> dict:
+    return _fetch_batch("fetch_balance_sheet", "statements", _read_balance_sheet, symbols)
+
+
+def fetch_cash_flow_batch(symbols: list) -> dict:
+    return _fetch_batch("fetch_cash_flow", "statements", _read_cash_flow, symbols)
+
+
+@upstream.limited("yahoo")
+def _download(symbols: list, **kwargs):
+    return yf.download(symbols, **kwargs)
+
+
+def fetch_price_history_batch(symbols: list, period: str = "1y", interval: str = "1mo") -> dict:
+    """Fetch price history for many symbols with a single threaded yf.download call.
+
+    Results are cached under their own key rather than fetch_price_history's:
+    yf.download drops the time zone from daily and longer bars, while
+    Ticker.history keeps the exchange's, so the two payloads differ in shape.
+    """
+    symbols = _normalize_symbols(symbols)
+    params = {"period": period, "interval": interval}
+    results, errors = {}, {}
+    missing = []
+    for symbol in symbols:
+        cached = cache.get(make_key("fetch_price_history_batch", symbol, params))
+        if cached is not None:
+            results[symbol] = cached
+        else:
+            missing.append(symbol)
+    if not missing:
+        return {"results": results, "errors": errors}
+
+    logger.info(f"Downloading price history for {len(missing)} symbols")
+    try:
+        with upstream.priority(upstream.BATCH):
+            data = _download(
+                missing,
+                period=period,
+                interval=interval,
+                group_by="ticker",
+                auto_adjust=True,
+                actions=True,
+                threads=True,
+                progress=False,
+            )
+    except Exception as e:
+        logger.error(f"Error downloading price history batch: {e}")
+        for symbol in missing:
+            errors[symbol] = str(e)
+        return {"results": results, "errors": errors}
+
+    for symbol in missing:
+        if isinstance(data.columns, pd.MultiIndex):
+            if symbol not in data.columns.get_level_values(0):
+                errors[symbol] = f"No price history found for {symbol}"
+                continue
+            hist = data[symbol]
+        else:
+            hist = data
+        hist = hist.dropna(how="all")
+        if hist.empty:
+            errors[symbol] = f"No price history found for {symbol}"
+            continue
+        value = hist.reset_index().to_dict(orient="list")
+        cache.put(make_key("fetch_price_history_batch", symbol, params), value, "history")
+        results[symbol] = value
+    return {"results": results, "errors": errors}
+
+
+def fetch_dashboard_bundle(symbol: str, period: str = "1y", interval: str = "1mo", history_rows: int = 12,
+                           info_fields=None, last_n_periods=None) -> dict:
+    """Fetch every dataset the dashboard renders, concurrently and over one shared yf.Ticker.
+
+    Each dataset goes through the same cache entry as its single tool. Failures
+    are reported per dataset under "errors" and leave that dataset empty.
+    info_fields and last_n_periods project the result as the single tools do.
+    """
+    logger.info(f"Fetching dashboard bundle for {symbol}")
+    stock = yf.Ticker(symbol)
+    history_params = {"period": period, "interval": interval}
+    jobs = {
+        "info": ("fetch_stock_info", {}, "info", lambda: _read_stock_info(stock)),
+        "price_history": ("fetch_price_history", history_params, "history",
+                          lambda: price_store.history(symbol, period, interval, stock)),
+        "quarterly": ("fetch_quarterly_financials", {}, "statements", lambda: _read_quarterly_financials(stock)),
+        "annual": ("fetch_annual_financials", {}, "statements", lambda: _read_annual_financials(stock)),
+        "balance_sheet": ("fetch_balance_sheet", {}, "statements", lambda: _read_balance_sheet(stock)),
+        "cash_flow": ("fetch_cash_flow", {}, "statements", lambda: _read_cash_flow(stock)),
+    }
+    bundle = {"symbol": symbol.upper(), "errors": {}}
+
+    def fetch_one(name):
+        tool, params, dataset, fetch = jobs[name]
+        if dataset == "history" and PRICE_STORE_DIR:
+            # Served from the mapped series files, like fetch_price_history
+            return fetch()
+        return cache.get_or_fetch(tool, symbol, params, dataset, fetch)
+
+    for name, future in upstream.fan_out(fetch_one, jobs).items():
+        try:
+            bundle[name] = future.result() or {}
+        except Exception as e:
+            logger.error(f"Error fetching {name} for {symbol}: {e}")
+            bundle["errors"][name] = str(e)
+            bundle[name] = {}
+    # Only the most recent rows are rendered, so trim before serialization
+    if history_rows and bundle["price_history"]:
+        bundle["price_history"] = {
+            column: values[-history_rows:] for column, values in bundle["price_history"].items()
+        }
+    bundle["info"] = project_info(bundle["info"], info_fields)
+    bundle["quarterly"] = project_statement(bundle["quarterly"], last_n_periods=last_n_periods, periods_first=True)
+    for name in ("annual", "balance_sheet", "cash_flow"):
+        bundle[name] = project_statement(bundle[name], last_n_periods=last_n_periods)
+    return bundle
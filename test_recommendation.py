@@ -0,0 +1,59 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+import fakes
+import llm_client
+import recommendation
+from stock_cache import cache
+
+
+class CountingLLMClient(fakes.FakeLLMClient):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def complete(self, prompt, model, temperature, timeout=None):
+        self.calls += 1
+        return await super().complete(prompt, model, temperature, timeout)
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    fakes.install()
+    client = CountingLLMClient()
+    monkeypatch.setattr(llm_client, "get_client", lambda api_key: client)
+    cache.clear()
+    yield client
+    cache.clear()
+
+
+def _recommendation_entries():
+    return [key for key in cache._entries if key[0] == "get_recommendation"]
+
+
+def test_recommendation_asks_llm_once_and_caches(llm):
+    first = asyncio.run(recommendation.get_recommendation("AAPL"))
+    second = asyncio.run(recommendation.get_recommendation("AAPL"))
+    assert first["recommendation"] == second["recommendation"]
+    assert llm.calls == 1
+    assert len(_recommendation_entries()) == 1
+
+
+@pytest.mark.parametrize("attribute", ["info", "financials"])
+def test_recommendation_without_stock_data_skips_llm_and_cache(llm, monkeypatch, attribute):
+    empty = {} if attribute == "info" else pd.DataFrame()
+    monkeypatch.setattr(fakes.FakeTicker, attribute, property(lambda self: empty))
+    result = asyncio.run(recommendation.get_recommendation("AAPL"))
+    assert result == {"error": "Stock data unavailable for AAPL"}
+    assert llm.calls == 0
+    assert _recommendation_entries() == []
+
+
+def test_prompt_keeps_exact_values_and_digest_rounds_them():
+    annual = {"Total Revenue": {"2023": 1.0e9, "2024": 1.2e9}}
+    key_info, annual_summary = recommendation.build_prompt_inputs({"symbol": "AAPL", "currentPrice": 187.4321}, annual)
+    moved, _ = recommendation.build_prompt_inputs({"symbol": "AAPL", "currentPrice": 187.4012}, annual)
+    assert "187.4321" in recommendation.build_prompt(key_info, annual_summary)
+    assert recommendation.prompt_digest(key_info, annual_summary) == recommendation.prompt_digest(moved, annual_summary)
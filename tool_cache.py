@@ -0,0 +1,542 @@
+import asyncio
+import contextlib
+import inspect
+import json
+import logging
+import math
+import os
+import pickle
+import random
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+# Time-to-live per dataset, in seconds. Override with CACHE_TTL_<DATASET>.
+DEFAULT_TTLS = {
+    "info": 30,
+    "history": 300,
+    "statements": 6 * 60 * 60,
+    "recommendation": 6 * 60 * 60,
+    "news": 300,
+}
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Weight of the probabilistic early refresh; 0 disables it
+DEFAULT_EARLY_REFRESH_BETA = 1.0
+
+# Datasets written to the on-disk store when CACHE_DB_PATH is set
+DEFAULT_PERSIST_DATASETS = ("history", "statements", "recommendation")
+
+# Seconds between sweeps of expired rows from the on-disk store
+DEFAULT_PURGE_INTERVAL = 600
+
+
+def estimate_size(value) -> int:
+    """Approximate the memory cost of a cached value in bytes."""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+def make_key(tool: str, symbol: str, params: dict = None) -> tuple:
+    """Build a cache key from the tool name, symbol and call parameters."""
+    params = params or {}
+    return (tool, symbol.upper(), tuple(sorted((k, repr(v)) for k, v in params.items())))
+
+
+class DiskStore:
+    """SQLite store for tool results, shared by every server process on the host.
+
+    WAL mode lets several processes read while one writes. Values are pickled
+    and zlib-compressed; expiry is stored as wall-clock time so it survives
+    restarts. Expired rows are swept on write, at most once per purge_interval.
+    """
+
+    def __init__(self, path: str, purge_interval: float = DEFAULT_PURGE_INTERVAL):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._next_purge = time.monotonic() + purge_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " tool TEXT NOT NULL, symbol TEXT NOT NULL, params TEXT NOT NULL,"
+            " dataset TEXT NOT NULL, expires_at REAL NOT NULL, value BLOB NOT NULL,"
+            " PRIMARY KEY (tool, symbol, params))"
+        )
+
+    @staticmethod
+    def _row_key(key: tuple) -> tuple:
+        tool, symbol, params = key
+        return tool, symbol, json.dumps(params)
+
+    def get(self, key: tuple):
+        """Return (value, expires_at) for a live entry, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM results WHERE tool = ? AND symbol = ? AND params = ? AND expires_at > ?",
+                self._row_key(key) + (time.time(),),
+            ).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(zlib.decompress(row[0])), row[1]
+
+    def put(self, key: tuple, value, dataset: str, expires_at: float):
+        blob = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (tool, symbol, params, dataset, expires_at, value) VALUES (?, ?, ?, ?, ?, ?)",
+                self._row_key(key) + (dataset, expires_at, blob),
+            )
+        if time.monotonic() >= self._next_purge:
+            self.purge()
+
+    def purge(self) -> int:
+        """Delete expired rows. Returns the number deleted."""
+        with self._lock:
+            self._next_purge = time.monotonic() + self.purge_interval
+            deleted = self._conn.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),)).rowcount
+        if deleted:
+            logger.info(f"Purged {deleted} expired entries from {self.path}")
+        return deleted
+
+    def delete(self, symbol: str, tool: str = None):
+        with self._lock:
+            if tool is None:
+                self._conn.execute("DELETE FROM results WHERE symbol = ?", (symbol,))
+            else:
+                self._conn.execute("DELETE FROM results WHERE symbol = ? AND tool = ?", (symbol, tool))
+
+    def load(self):
+        """Yield (key, value, dataset, expires_at) for every live entry, dropping expired ones."""
+        self.purge()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT tool, symbol, params, dataset, expires_at, value FROM results"
+            ).fetchall()
+        for tool, symbol, params, dataset, expires_at, blob in rows:
+            try:
+                value = pickle.loads(zlib.decompress(blob))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable cache entry {tool} for {symbol}: {e}")
+                continue
+            key = (tool, symbol, tuple(tuple(p) for p in json.loads(params)))
+            yield key, value, dataset, expires_at
+
+
+def _cancelling() -> bool:
+    """Whether cancellation of the current task has been requested (always False before Python 3.11)."""
+    task = asyncio.current_task()
+    return bool(task is not None and getattr(task, "cancelling", lambda: 0)())
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at", "delta")
+
+    def __init__(self, value, size, expires_at, delta):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        # How long the upstream fetch took, used to schedule early refreshes
+        self.delta = delta
+
+
+class _Flight:
+    """An upstream fetch in progress, shared by every caller asking for the same key."""
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ToolCache:
+    """LRU cache for tool results, bounded by approximate bytes, with per-dataset TTLs."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttls: dict = None,
+                 store: DiskStore = None, persist_datasets=DEFAULT_PERSIST_DATASETS,
+                 early_refresh_beta: float = DEFAULT_EARLY_REFRESH_BETA, background=contextlib.nullcontext):
+        self.max_bytes = max_bytes
+        # Context manager factory that background refreshes run under
+        self.background = background
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.store = store
+        self.persist_datasets = set(persist_datasets)
+        self.early_refresh_beta = early_refresh_beta
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._async_flights = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_hits = 0
+        self.disk_errors = 0
+        self.coalesced = 0
+        self.early_refreshes = 0
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Cache configured from the CACHE_* environment variables; kwargs go to the constructor."""
+        max_bytes = int(os.getenv("CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+        ttls = {}
+        for dataset, ttl in DEFAULT_TTLS.items():
+            ttls[dataset] = float(os.getenv(f"CACHE_TTL_{dataset.upper()}", str(ttl)))
+        store = None
+        db_path = os.getenv("CACHE_DB_PATH")
+        if db_path:
+            try:
+                store = DiskStore(db_path, float(os.getenv("CACHE_DB_PURGE_INTERVAL", str(DEFAULT_PURGE_INTERVAL))))
+            except Exception as e:
+                logger.error(f"Could not open cache database {db_path}: {e}")
+        persist = os.getenv("CACHE_PERSIST_DATASETS", ",".join(DEFAULT_PERSIST_DATASETS))
+        persist_datasets = [d.strip() for d in persist.split(",") if d.strip()]
+        beta = float(os.getenv("CACHE_EARLY_REFRESH_BETA", str(DEFAULT_EARLY_REFRESH_BETA)))
+        return cls(max_bytes=max_bytes, ttls=ttls, store=store, persist_datasets=persist_datasets,
+                   early_refresh_beta=beta, **kwargs)
+
+    def ttl_for(self, dataset: str) -> float:
+        return self.ttls.get(dataset, DEFAULT_TTLS["info"])
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        found = self._lookup(key)
+        return found[0] if found is not None else None
+
+    def peek(self, key):
+        """Return a fresh in-memory value for key without fetching, or None.
+
+        Misses are not counted, since the caller is expected to follow up with
+        get_or_fetch(). Entries due for an early refresh are reported as
+        missing so that get_or_fetch() gets to schedule the refresh.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                return None
+            if self._should_refresh_early(entry.expires_at, entry.delta):
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def expires_in(self, key):
+        """Seconds until the in-memory entry for key expires, or None when it is absent or expired.
+
+        Does not count as a hit or miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            remaining = entry.expires_at - time.monotonic()
+            return remaining if remaining > 0 else None
+
+    def _lookup(self, key):
+        """Return (value, expires_at, delta) for key, or None on a miss.
+
+        Memory misses fall back to the disk store, which may hold results
+        written by another server process.
+        """
+        found = self._lookup_memory(key)
+        return found if found is not None else self._lookup_disk(key)
+
+    def _lookup_memory(self, key):
+        """The in-memory half of _lookup(); a miss is not counted, since the disk is asked next."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value, entry.expires_at, entry.delta
+        return None
+
+    def _lookup_disk(self, key):
+        found = self._store_get(key)
+        with self._lock:
+            if found is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+        value, expires_at = found
+        expires_at = time.monotonic() + (expires_at - time.time())
+        self._insert(key, value, expires_at)
+        return value, expires_at, 0.0
+
+    def put(self, key, value, dataset: str, delta: float = 0.0):
+        ttl = self.ttl_for(dataset)
+        if self._insert(key, value, time.monotonic() + ttl, delta) and dataset in self.persist_datasets:
+            self._store_put(key, value, dataset, time.time() + ttl)
+
+    def warm(self) -> int:
+        """Load every live entry from the disk store into memory. Returns the number loaded."""
+        if self.store is None:
+            return 0
+        loaded = 0
+        try:
+            for key, value, dataset, expires_at in self.store.load():
+                if self._insert(key, value, time.monotonic() + (expires_at - time.time())):
+                    loaded += 1
+        except Exception as e:
+            self.disk_errors += 1
+            logger.error(f"Error warming cache from {self.store.path}: {e}")
+        logger.info(f"Warmed cache with {loaded} entries from {self.store.path}")
+        return loaded
+
+    def _store_get(self, key):
+        if self.store is None:
+            return None
+        try:
+            return self.store.get(key)
+        except Exception as e:
+            self.disk_errors += 1
+            logger.error(f"Error reading {key[0]} for {key[1]} from cache database: {e}")
+            return None
+
+    def _store_put(self, key, value, dataset, expires_at):
+        if self.store is None:
+            return
+        try:
+            self.store.put(key, value, dataset, expires_at)
+        except Exception as e:
+            self.disk_errors += 1
+            logger.error(f"Error writing {key[0]} for {key[1]} to cache database: {e}")
+
+    def _insert(self, key, value, expires_at, delta: float = 0.0) -> bool:
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            logger.warning(f"Not caching {key[0]} for {key[1]}: {size} bytes exceeds cache size")
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, size, expires_at, delta)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get_or_fetch(self, tool: str, symbol: str, params: dict, dataset: str, fetch, refresh: bool = False):
+        """Return a cached result, calling fetch() on a miss. Empty results are not cached.
+
+        refresh=True skips the lookup and replaces the entry with a fresh result.
+
+        Concurrent misses for the same key share a single fetch() call. Hits
+        close to expiry occasionally trigger a background refresh (XFetch), so
+        a popular key is renewed before it expires instead of every caller
+        missing at once.
+        """
+        key = make_key(tool, symbol, params)
+        found = None if refresh else self._lookup(key)
+        if found is not None:
+            value, expires_at, delta = found
+            if self._should_refresh_early(expires_at, delta):
+                self._refresh_in_background(key, dataset, fetch)
+            return value
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if leader:
+            self._run_flight(key, flight, dataset, fetch)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    async def aget_or_fetch(self, tool: str, symbol: str, params: dict, dataset: str, fetch, refresh: bool = False):
+        """Async counterpart of get_or_fetch() for a coroutine function fetch.
+
+        Concurrent misses on the event loop share one awaited fetch().
+        """
+        key = make_key(tool, symbol, params)
+        found = None
+        if not refresh:
+            found = self._lookup_memory(key)
+            if found is None:
+                found = await self._off_loop(self._lookup_disk, key)
+        if found is not None:
+            value, expires_at, delta = found
+            if self._should_refresh_early(expires_at, delta) and key not in self._async_flights:
+                with self._lock:
+                    self.early_refreshes += 1
+                asyncio.ensure_future(self._arefresh(key, dataset, fetch))
+            return value
+        while True:
+            flight = self._async_flights.get(key)
+            if flight is None:
+                return await self._arun_flight(key, dataset, fetch)
+            with self._lock:
+                self.coalesced += 1
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                # Our own cancellation propagates; a cancelled leader is replaced by the next waiter
+                if not flight.cancelled() or _cancelling():
+                    raise
+                logger.info(f"Fetch of {key[0]} for {key[1]} was cancelled, retrying")
+
+    async def _off_loop(self, fn, *args, **kwargs):
+        """Run fn on a worker thread when it may touch the disk store, inline otherwise."""
+        if self.store is None:
+            return fn(*args, **kwargs)
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+    async def _arefresh(self, key, dataset, fetch):
+        try:
+            with self.background():
+                await self._arun_flight(key, dataset, fetch)
+        except Exception as e:
+            logger.error(f"Error refreshing {key[0]} for {key[1]}: {e}")
+
+    async def _arun_flight(self, key, dataset, fetch):
+        flight = self._async_flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            started = time.monotonic()
+            value = await fetch()
+            if value:
+                await self._off_loop(self.put, key, value, dataset, delta=time.monotonic() - started)
+            flight.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            # Waiters retry rather than hang on a flight that will never finish
+            flight.cancel()
+            raise
+        except BaseException as e:
+            flight.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting for it
+            flight.exception()
+            raise
+        finally:
+            # A refresh may have started a newer flight for the key; leave that one alone
+            if self._async_flights.get(key) is flight:
+                del self._async_flights[key]
+
+    def _run_flight(self, key, flight, dataset, fetch):
+        try:
+            started = time.monotonic()
+            flight.value = fetch()
+            if flight.value:
+                self.put(key, flight.value, dataset, delta=time.monotonic() - started)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _should_refresh_early(self, expires_at: float, delta: float) -> bool:
+        if self.early_refresh_beta <= 0 or delta <= 0:
+            return False
+        jitter = -delta * self.early_refresh_beta * math.log(1.0 - random.random())
+        return time.monotonic() + jitter >= expires_at
+
+    def _refresh_in_background(self, key, dataset, fetch):
+        with self._lock:
+            if key in self._flights:
+                return
+            flight = self._flights[key] = _Flight()
+            self.early_refreshes += 1
+
+        def refresh():
+            with self.background():
+                self._run_flight(key, flight, dataset, fetch)
+            if flight.error is not None:
+                logger.error(f"Error refreshing {key[0]} for {key[1]}: {flight.error}")
+        threading.Thread(target=refresh, name=f"refresh-{key[0]}-{key[1]}", daemon=True).start()
+
+    def cached(self, dataset: str):
+        """Decorator caching a loader's result under its name and bound arguments."""
+        def decorator(fn):
+            signature = inspect.signature(fn)
+
+            def key_params(args, kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                params = dict(bound.arguments)
+                return params.pop("symbol"), params
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                symbol, params = key_params(args, kwargs)
+                return self.get_or_fetch(fn.__name__, symbol, params, dataset, lambda: fn(*args, **kwargs))
+
+            def peek(*args, **kwargs):
+                symbol, params = key_params(args, kwargs)
+                return self.peek(make_key(fn.__name__, symbol, params))
+
+            wrapper.peek = peek
+            return wrapper
+        return decorator
+
+    def invalidate(self, symbol: str, tool: str = None) -> int:
+        """Drop every entry for symbol (only tool's when given), in memory and on disk. Returns the number dropped."""
+        symbol = symbol.upper()
+        with self._lock:
+            keys = [key for key in self._entries if key[1] == symbol and (tool is None or key[0] == tool)]
+            for key in keys:
+                self._remove(key)
+        if self.store is not None:
+            try:
+                self.store.delete(symbol, tool)
+            except Exception as e:
+                self.disk_errors += 1
+                logger.error(f"Error deleting {symbol} from cache database: {e}")
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttls": dict(self.ttls),
+                "disk_store": self.store.path if self.store else None,
+                "disk_hits": self.disk_hits,
+                "disk_errors": self.disk_errors,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights) + len(self._async_flights),
+                "early_refreshes": self.early_refreshes,
+            }
+
@@ -0,0 +1,201 @@
+import collections
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "1") not in ("0", "false", "False")
+# Finished spans kept in memory per process
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "4096"))
+# Optional JSONL file every finished span is appended to
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+# Requests slower than this get a waterfall of their spans
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "5"))
+
+
+class Span:
+    """One timed operation. Spans of one request share a trace_id and link to their parent."""
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, attributes: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.status = "ok"
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+
+    def traceparent(self) -> str:
+        """W3C traceparent header value for propagating this span to another process."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def end(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._started
+            _export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "attributes": self.attributes,
+            "process": _PROCESS,
+        }
+
+
+class _RemoteParent:
+    """Span context received from another process."""
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+
+_PROCESS = f"{os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else 'python'}:{os.getpid()}"
+_current = contextvars.ContextVar("current_span", default=None)
+_buffer = collections.deque(maxlen=TRACE_BUFFER_SIZE)
+_file_lock = threading.Lock()
+
+
+def _export(span: Span):
+    if not TRACE_ENABLED:
+        return
+    record = span.to_dict()
+    _buffer.append(record)
+    if TRACE_FILE:
+        try:
+            with _file_lock, open(TRACE_FILE, "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        except OSError as e:
+            logger.error(f"Error writing span to {TRACE_FILE}: {e}")
+
+
+def parse_traceparent(value):
+    """Return the remote parent encoded in a traceparent value, or None when it is missing or malformed."""
+    try:
+        version, trace_id, span_id, _ = value.split("-")
+        int(trace_id, 16), int(span_id, 16)
+    except (AttributeError, ValueError):
+        return None
+    if len(trace_id) != 32 or len(span_id) != 16:
+        return None
+    return _RemoteParent(trace_id, span_id)
+
+
+def current():
+    """The active span in this context, or None."""
+    return _current.get()
+
+
+def start_span(name: str, parent=None, **attributes) -> Span:
+    """Create a span under parent (default: the active span) without activating it."""
+    parent = parent if parent is not None else _current.get()
+    trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+    return Span(name, trace_id, parent.span_id if parent is not None else None, attributes)
+
+
+@contextlib.contextmanager
+def span(name: str, parent=None, **attributes):
+    """Time the enclosed block as a child of the active span (or of parent) and make it active."""
+    new_span = start_span(name, parent, **attributes)
+    token = _current.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.status = "error"
+        new_span.attributes["error"] = str(e) or type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        new_span.end()
+
+
+@contextlib.contextmanager
+def activate(parent):
+    """Make a span (e.g. one captured in another thread) the parent of spans created in this block."""
+    token = _current.set(parent)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class Sections:
+    """A root span split into consecutive child spans, for long linear scripts.
+
+    Each section() call ends the previous section and starts the next one;
+    finish() ends the last section and the root.
+    """
+
+    def __init__(self, name: str, **attributes):
+        self.root = start_span(name, **attributes)
+        self._root_token = _current.set(self.root)
+        self._section = None
+        self._token = None
+
+    def section(self, name: str, **attributes):
+        self._end_section()
+        self._section = start_span(name, self.root, **attributes)
+        self._token = _current.set(self._section)
+
+    def _end_section(self):
+        if self._section is not None:
+            _current.reset(self._token)
+            self._section.end()
+            self._section = None
+
+    def finish(self) -> Span:
+        self._end_section()
+        _current.reset(self._root_token)
+        self.root.end()
+        return self.root
+
+
+def spans(trace_id: str) -> list:
+    """Finished spans of one trace held in this process's buffer."""
+    return [record for record in list(_buffer) if record["trace_id"] == trace_id]
+
+
+def waterfall(records: list, width: int = 40) -> str:
+    """Render spans (possibly from several processes) as an indented text waterfall."""
+    if not records:
+        return "(no spans)"
+    records = sorted(records, key=lambda record: record["start"])
+    by_id = {record["span_id"]: record for record in records}
+    origin = records[0]["start"]
+    total = max(record["start"] + (record["duration"] or 0) for record in records) - origin or 1e-9
+
+    def depth(record):
+        level = 0
+        while record["parent_id"] in by_id and level < 32:
+            record = by_id[record["parent_id"]]
+            level += 1
+        return level
+
+    lines = []
+    for record in records:
+        offset = record["start"] - origin
+        duration = record["duration"] or 0
+        bar_start = int(offset / total * width)
+        bar = (" " * bar_start + "#" * max(1, int(duration / total * width)))[:width]
+        marker = " !" if record["status"] != "ok" else ""
+        lines.append(
+            f"{offset * 1000:9.1f} ms {duration * 1000:9.1f} ms |{bar:<{width}}| "
+            f"{'  ' * depth(record)}{record['name']}{marker}"
+        )
+    return "\n".join(lines)
+
@@ -0,0 +1,274 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Threads available to blocking tool work. LLM calls are async (see
+# llm_client.py) and never occupy these threads.
+YAHOO_WORKERS = int(os.getenv("YAHOO_WORKERS", "16"))
+# Threads shared by the per-symbol and per-dataset fan-outs inside that work
+YAHOO_FANOUT_WORKERS = int(os.getenv("YAHOO_FANOUT_WORKERS", "16"))
+
+# Maximum concurrent Yahoo requests, enforced where the request is made
+YAHOO_CONCURRENCY = int(os.getenv("YAHOO_CONCURRENCY", "8"))
+
+# Token bucket: sustained Yahoo requests per second and burst size
+YAHOO_RATE = float(os.getenv("YAHOO_RATE", "4"))
+YAHOO_BURST = float(os.getenv("YAHOO_BURST", "10"))
+# Tokens only interactive requests may spend, so batch and background work
+# cannot drain the budget
+YAHOO_INTERACTIVE_RESERVE = float(os.getenv("YAHOO_INTERACTIVE_RESERVE", "2"))
+
+# Backoff after a throttling response, doubling on each consecutive one
+YAHOO_BACKOFF_BASE = float(os.getenv("YAHOO_BACKOFF_BASE", "2"))
+YAHOO_BACKOFF_MAX = float(os.getenv("YAHOO_BACKOFF_MAX", "60"))
+# Times a throttled request is retried (after the backoff) before failing
+YAHOO_THROTTLE_RETRIES = int(os.getenv("YAHOO_THROTTLE_RETRIES", "2"))
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BATCH, BACKGROUND)
+
+_priority = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def priority(level: str):
+    """Run upstream calls made in this context (and work it hands to run_blocking) at the given priority."""
+    if level not in PRIORITIES:
+        raise ValueError(f"Unknown priority {level!r}")
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def in_context(fn, *args, **kwargs):
+    """Bind fn to a copy of the current context, for handing work to another thread.
+
+    Executors do not propagate context variables on their own, so without
+    this the upstream priority would be lost.
+    """
+    return functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def is_throttled(error: Exception) -> bool:
+    if type(error).__name__ == "YFRateLimitError":
+        return True
+    message = str(error).lower()
+    return "429" in message or "too many requests" in message or "rate limit" in message
+
+
+class Scheduler:
+    """Admission control for one upstream.
+
+    Requests wait in a priority queue for a concurrency slot and a token
+    from a token bucket. Interactive requests are always admitted first,
+    and lower priorities additionally leave a reserve of tokens untouched.
+    After a throttling response nothing is admitted until an exponential
+    backoff has passed.
+    """
+
+    def __init__(self, name: str, concurrency: int, rate: float, burst: float, reserve: float = 0.0):
+        self.name = name
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.reserve = min(reserve, self.burst - 1.0)
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._backoff_until = 0.0
+        self._consecutive_throttles = 0
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self.in_flight = 0
+        self.throttled = 0
+        self._waits = {level: {"admitted": 0, "total_wait": 0.0, "max_wait": 0.0} for level in PRIORITIES}
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        else:
+            self._tokens = self.burst
+        self._refilled_at = now
+
+    def _delay(self, level, now):
+        """Seconds until the request at the head of the queue may start; 0 when it may start now."""
+        if now < self._backoff_until:
+            return self._backoff_until - now
+        if self.in_flight >= self.concurrency:
+            return None
+        needed = 1.0 if level == INTERACTIVE else 1.0 + self.reserve
+        if self._tokens >= needed:
+            return 0.0
+        return (needed - self._tokens) / self.rate
+
+    def acquire(self) -> float:
+        """Wait for admission at the current priority and return the seconds waited."""
+        level = _priority.get()
+        entry = (PRIORITIES.index(level), next(self._seq))
+        started = time.monotonic()
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._waiting[0] == entry:
+                    delay = self._delay(level, now)
+                    if delay == 0.0:
+                        break
+                else:
+                    delay = None
+                self._condition.wait(delay)
+            heapq.heappop(self._waiting)
+            self._tokens -= 1.0
+            self.in_flight += 1
+            waited = time.monotonic() - started
+            stats = self._waits[level]
+            stats["admitted"] += 1
+            stats["total_wait"] += waited
+            stats["max_wait"] = max(stats["max_wait"], waited)
+            # The next waiter may be admissible too
+            self._condition.notify_all()
+        metrics.upstream_wait.observe(waited, upstream=self.name, priority=level)
+        return waited
+
+    def release(self, throttled: bool = False):
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self._consecutive_throttles += 1
+                backoff = min(YAHOO_BACKOFF_MAX, YAHOO_BACKOFF_BASE * 2 ** (self._consecutive_throttles - 1))
+                backoff *= random.uniform(0.8, 1.2)
+                self._backoff_until = max(self._backoff_until, time.monotonic() + backoff)
+                self._tokens = 0.0
+                logger.warning(f"{self.name} throttled, backing off for {backoff:.1f}s")
+            else:
+                self._consecutive_throttles = 0
+            self._condition.notify_all()
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn once admitted, retrying it after the backoff when the upstream throttles."""
+        attempt = 0
+        while True:
+            with tracing.span(f"{self.name} {fn.__name__}", attempt=attempt) as span:
+                span.attributes["queue_wait"] = self.acquire()
+                started = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    metrics.upstream_errors.inc(upstream=self.name, call=fn.__name__)
+                    throttled = is_throttled(e)
+                    self.release(throttled=throttled)
+                    if not throttled or attempt >= YAHOO_THROTTLE_RETRIES:
+                        raise
+                    span.status = "throttled"
+                    attempt += 1
+                    continue
+                finally:
+                    metrics.upstream_duration.observe(time.perf_counter() - started, upstream=self.name, call=fn.__name__)
+            self.release()
+            return result
+
+    def stats(self) -> dict:
+        with self._condition:
+            self._refill(time.monotonic())
+            queued = {level: 0 for level in PRIORITIES}
+            for rank, _ in self._waiting:
+                queued[PRIORITIES[rank]] += 1
+            waits = {
+                level: {
+                    "admitted": stats["admitted"],
+                    "avg_wait": stats["total_wait"] / stats["admitted"] if stats["admitted"] else 0.0,
+                    "max_wait": stats["max_wait"],
+                }
+                for level, stats in self._waits.items()
+            }
+            return {
+                "queued": queued,
+                "in_flight": self.in_flight,
+                "tokens": round(self._tokens, 2),
+                "rate": self.rate,
+                "burst": self.burst,
+                "throttled": self.throttled,
+                "backoff_remaining": max(0.0, self._backoff_until - time.monotonic()),
+                "waits": waits,
+            }
+
+
+_pools = {
+    "yahoo": ThreadPoolExecutor(max_workers=YAHOO_WORKERS, thread_name_prefix="yahoo"),
+    "yahoo-fanout": ThreadPoolExecutor(max_workers=YAHOO_FANOUT_WORKERS, thread_name_prefix="yahoo-fanout"),
+}
+
+_schedulers = {
+    "yahoo": Scheduler("yahoo", YAHOO_CONCURRENCY, YAHOO_RATE, YAHOO_BURST, YAHOO_INTERACTIVE_RESERVE),
+}
+
+
+def limited(upstream: str):
+    """Decorator admitting each call through the upstream's scheduler."""
+    scheduler = _schedulers[upstream]
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return scheduler.call(fn, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def fan_out(fn, items, limit: int = None) -> dict:
+    """Run fn(item) for every item on the shared fan-out pool and return {item: future}.
+
+    At most limit of them are queued or running at once, so one large batch
+    cannot fill the pool's queue ahead of everyone else. The work keeps the
+    caller's context, and with it the upstream priority. fn must not fan out
+    again, or it could wait on threads held by its own callers.
+    """
+    pool = _pools["yahoo-fanout"]
+    slots = threading.BoundedSemaphore(limit) if limit else None
+    futures = {}
+    for item in items:
+        if slots is not None:
+            slots.acquire()
+        future = pool.submit(in_context(fn, item))
+        if slots is not None:
+            future.add_done_callback(lambda _: slots.release())
+        futures[item] = future
+    return futures
+
+
+def stats() -> dict:
+    return {name: scheduler.stats() for name, scheduler in _schedulers.items()}
+
+
+async def run_blocking(pool: str, fn, *args, **kwargs):
+    """Run a blocking function on the named pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pools[pool], in_context(fn, *args, **kwargs))
+
+
+async def run_cached(pool: str, fn, *args, **kwargs):
+    """Serve a cached loader's hits on the event loop and run its misses on the pool."""
+    value = fn.peek(*args, **kwargs)
+    if value is not None:
+        return value
+    return await run_blocking(pool, fn, *args, **kwargs)
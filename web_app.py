@@ -1,19 +1,21 @@
 import streamlit as st
-import asyncio
 import os
 import pandas as pd
 import plotly.express as px
 from dotenv import load_dotenv
 import json
-import yfinance as yf
 import plotly.graph_objects as go
 import re
 import logging
+import queue
 
-from langchain_mcp_adapters.tools import load_mcp_tools
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
-from mcp import ClientSession
+import dashboard
+import statements
+import tracing
+from mcp_pool import MCPSessionPool, MCP_CALL_TIMEOUT
+from tool_cache import make_key
 from mcp.client.stdio import stdio_client
 from mcp.server.stdio import StdioServerParameters
 
@@ -46,70 +48,129 @@ server_params = StdioServerParameters(
     args=["mcp_server.py"],
 )
 
-async def get_dashboard_data(symbol):
+@st.cache_resource
+def get_mcp_pool():
+    """Warm MCP sessions shared by every Streamlit session and rerun in this process."""
+    return MCPSessionPool(lambda: stdio_client(server_params))
+
+# Info keys the dashboard renders; the bundle omits everything else
+DASHBOARD_INFO_FIELDS = [
+    "currentPrice", "regularMarketChange", "regularMarketChangePercent", "marketCap", "trailingPE",
+    "dividendYield", "longName", "shortName", "website", "sector", "industry", "city", "state", "country",
+    "fullTimeEmployees", "companyOfficers", "trailingEps", "beta", "fiftyTwoWeekHigh", "fiftyTwoWeekLow",
+    "dividendRate", "averageVolume",
+]
+# Four quarters for the revenue chart; the statement tables show three years plus YoY
+DASHBOARD_PERIODS = 4
+# Articles in the news card
+NEWS_ARTICLES = 15
+
+@st.cache_resource
+def get_dashboard_cache():
+    """Bundles and recommendations shared by every Streamlit session in this process."""
+    return dashboard.make_cache()
+
+def fetch_bundle(symbol):
+    """Fetch the dashboard bundle and the news concurrently; the news goes under "news"."""
+    results = get_mcp_pool().call_tools({
+        "bundle": ("fetch_dashboard_bundle", {
+            "symbol": symbol,
+            "include_recommendation": False,
+            "history_format": "columnar",
+            "info_fields": DASHBOARD_INFO_FIELDS,
+            "last_n_periods": DASHBOARD_PERIODS,
+        }),
+        "news": ("fetch_news", {"symbol": symbol, "limit": NEWS_ARTICLES}),
+    })
+    if isinstance(results["bundle"], Exception):
+        raise results["bundle"]
+    bundle = json.loads(results["bundle"])
     try:
-        logger.info(f"Connecting to MCP server for {symbol}")
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                tools_list = await load_mcp_tools(session)
-                tools = {tool.name: tool for tool in tools_list}
-                
-                # Fetch data with error handling
-                try:
-                    stock_info = await tools["fetch_stock_info"].ainvoke({"symbol": symbol})
-                    logger.info(f"Successfully fetched stock info for {symbol}")
-                except Exception as e:
-                    logger.error(f"Error fetching stock info: {e}")
-                    stock_info = {}
-                
-                try:
-                    price_history = await tools["fetch_price_history"].ainvoke({"symbol": symbol, "period": "1y", "interval": "1mo"})
-                    logger.info(f"Successfully fetched price history for {symbol}")
-                except Exception as e:
-                    logger.error(f"Error fetching price history: {e}")
-                    price_history = {}
-                
-                try:
-                    quarterly = await tools["fetch_quarterly_financials"].ainvoke({"symbol": symbol})
-                    logger.info(f"Successfully fetched quarterly financials for {symbol}")
-                except Exception as e:
-                    logger.error(f"Error fetching quarterly financials: {e}")
-                    quarterly = {}
-                
-                return stock_info, price_history, quarterly
+        if isinstance(results["news"], Exception):
+            raise results["news"]
+        bundle["news"] = json.loads(results["news"]).get("articles", [])
     except Exception as e:
-        logger.error(f"Error in get_dashboard_data: {e}")
-        raise
-
-async def get_financials(symbol):
-    async with stdio_client(server_params) as (read, write):
-        async with ClientSession(read, write) as session:
-            await session.initialize()
-            tools_list = await load_mcp_tools(session)
-            tools = {tool.name: tool for tool in tools_list}
-            annual = await tools["fetch_annual_financials"].ainvoke({"symbol": symbol})
-            balance = await tools["fetch_balance_sheet"].ainvoke({"symbol": symbol})
-            cashflow = await tools["fetch_cash_flow"].ainvoke({"symbol": symbol})
-            # Parse if needed
-            def parse_if_str(d):
-                if isinstance(d, str):
-                    try:
-                        d = json.loads(d)
-                    except Exception:
-                        d = {}
-                return d
-            annual = parse_if_str(annual)
-            balance = parse_if_str(balance)
-            cashflow = parse_if_str(cashflow)
-            return annual, balance, cashflow
+        bundle["news"] = []
+        bundle.setdefault("errors", {})["news"] = str(e)
+    return bundle
+
+def get_dashboard_data(symbol):
+    """Return (bundle, recommendation, rec_events) for symbol without refetching what is already known.
+
+    This session's last result is used first, then the process-wide cache,
+    and only then the MCP server. When the recommendation is not known yet it
+    is None and rec_events streams it (see MCPSessionPool.stream_tool); the
+    stream starts before the bundle is fetched so the model generates meanwhile.
+    """
+    saved = st.session_state.get("dashboard")
+    if not saved or saved["symbol"] != symbol:
+        saved = {"symbol": symbol, "bundle": None, "recommendation": None}
+    cache = get_dashboard_cache()
+    recommendation = saved["recommendation"] or cache.get(make_key("get_recommendation", symbol))
+    rec_events = None if recommendation else get_mcp_pool().stream_tool("get_recommendation", {"symbol": symbol})
+    bundle = saved["bundle"]
+    if bundle is None:
+        logger.info(f"Fetching dashboard data for {symbol}")
+        try:
+            bundle = cache.get_or_fetch("fetch_dashboard_bundle", symbol, {}, "bundle", lambda: fetch_bundle(symbol))
+        except Exception as e:
+            logger.error(f"Error fetching dashboard bundle for {symbol}: {e}")
+            bundle = {}
+        for name, error in bundle.get("errors", {}).items():
+            logger.error(f"Error fetching {name} for {symbol}: {error}")
+        # Keep partial bundles out of the shared cache so the next click retries them
+        if bundle.get("errors"):
+            cache.invalidate(symbol, "fetch_dashboard_bundle")
+    # Empty and partial bundles are not kept either, so the next rerun retries them
+    kept = bundle if bundle and not bundle.get("errors") else None
+    st.session_state["dashboard"] = {"symbol": symbol, "bundle": kept, "recommendation": recommendation}
+    return bundle, recommendation, rec_events
+
+def save_recommendation(symbol, recommendation):
+    """Keep a streamed recommendation for this session's reruns and for other sessions."""
+    get_dashboard_cache().put(make_key("get_recommendation", symbol), recommendation, "recommendation")
+    saved = st.session_state.get("dashboard")
+    if saved and saved["symbol"] == symbol:
+        saved["recommendation"] = recommendation
+
+def show_waterfall(root):
+    """Log and show where a slow click spent its time, merging the server's spans for the same trace."""
+    records = tracing.spans(root.trace_id)
+    try:
+        server = get_mcp_pool().call_tool("get_trace", {"trace_id": root.trace_id})
+        records += json.loads(server).get("spans", [])
+    except Exception as e:
+        logger.error(f"Error fetching server spans for trace {root.trace_id}: {e}")
+    chart = tracing.waterfall(records)
+    logger.warning(f"Slow {root.name} for {root.attributes.get('symbol')} ({root.duration:.2f}s), trace {root.trace_id}:\n{chart}")
+    with st.expander(f"Slow request: {root.duration:.1f}s, where the time went"):
+        st.code(chart)
 
 st.title("Financial Dashboard")
 symbol = st.text_input("Stock Symbol (e.g., AAPL, MSFT)", "AAPL").upper()
 
-if st.button("Analyze"):
+col_analyze, col_refresh, _ = st.columns([1, 1, 6])
+if col_refresh.button("Refresh data"):
+    # Drop the shared copies too, so every session picks up the new data
+    get_dashboard_cache().invalidate(symbol)
+    st.session_state.pop("dashboard", None)
+    st.session_state["dashboard_symbol"] = symbol
+if col_analyze.button("Analyze"):
+    # A click goes back to the shared cache, which refetches once its entries expire
+    st.session_state.pop("dashboard", None)
+    st.session_state["dashboard_symbol"] = symbol
+
+# Widget interactions rerun the script; keep showing the last analyzed symbol
+if "dashboard_symbol" in st.session_state:
+    symbol = st.session_state["dashboard_symbol"]
+    # One trace per run of the page; each section below becomes a span in its waterfall
+    trace = tracing.Sections("analyze", symbol=symbol)
+    trace.section("fetch")
     with st.spinner("Fetching data..."):
-        stock_info, price_history, quarterly = asyncio.run(get_dashboard_data(symbol))
+        bundle, rec_result, rec_events = get_dashboard_data(symbol)
+        stock_info = bundle.get("info", {})
+        price_history = bundle.get("price_history", {})
+        quarterly = bundle.get("quarterly", {})
 
         # Ensure stock_info is a dict (parse if string)
         if isinstance(stock_info, str):
@@ -132,36 +193,12 @@ if st.button("Analyze"):
                     num /= 1000.0
                 return '%.2f%s' % (num, ['', 'K', 'M', 'B', 'T', 'P'][magnitude])
 
-            # --- MCP-based Recommendation ---
-            # Call the MCP tool for recommendation
-            async def fetch_recommendation(symbol):
-                async with stdio_client(server_params) as (read, write):
-                    async with ClientSession(read, write) as session:
-                        await session.initialize()
-                        tools_list = await load_mcp_tools(session)
-                        tools = {tool.name: tool for tool in tools_list}
-                        return await tools["get_recommendation"].ainvoke({"symbol": symbol})
-            rec_result = asyncio.run(fetch_recommendation(symbol))
-            if isinstance(rec_result, str):
-                try:
-                    rec_result = json.loads(rec_result)
-                except Exception:
-                    st.error(f"Error: Could not parse recommendation result. Received: {rec_result}")
-                    st.stop()
-            if rec_result and not rec_result.get("error"):
-                rec = rec_result.get("recommendation", "N/A")
-                icon = rec_result.get("icon", "ℹ️")
-                reason = rec_result.get("reason", "")
-                detailed_analysis = rec_result.get("detailed_analysis", "")
-            else:
-                rec = 'N/A'
-                icon = 'ℹ️'
-                reason = rec_result.get("error", "Could not get recommendation.") if rec_result else "Could not get recommendation."
-                detailed_analysis = ""
-
             # --- Top KPIs ---
+            trace.section("render.kpis")
             col_rec, col1, col2, col3, col4 = st.columns(5)
-            col_rec.metric("Recommendation", rec.upper(), icon)
+            # The recommendation streams in after the rest of the page has rendered
+            rec_placeholder = col_rec.empty()
+            rec_placeholder.metric("Recommendation", "…", "ℹ️")
             col1.metric(
                 "Current Price",
                 f"${stock_info.get('currentPrice', 'N/A')}",
@@ -170,7 +207,7 @@ if st.button("Analyze"):
             col2.metric("Market Cap", human_format(stock_info.get('marketCap', 'N/A')))
             col3.metric("P/E Ratio", f"{stock_info.get('trailingPE', 'N/A')}")
             col4.metric("Dividend Yield", f"{stock_info.get('dividendYield', 'N/A')}")
-            st.caption(f"{reason}")
+            reason_placeholder = st.empty()
 
             # --- Detailed Analysis ---
             def clean_analysis(text):
@@ -188,11 +225,18 @@ if st.button("Analyze"):
                 text = text.replace('_', ' ')
                 return text
 
-            if detailed_analysis:
-                st.subheader("Analysis")
-                st.markdown(clean_analysis(detailed_analysis))
+            analysis_placeholder = st.empty()
+
+            def render_recommendation(rec, icon, reason, detailed_analysis):
+                rec_placeholder.metric("Recommendation", rec.upper(), icon)
+                reason_placeholder.caption(f"{reason}")
+                if detailed_analysis:
+                    with analysis_placeholder.container():
+                        st.subheader("Analysis")
+                        st.markdown(clean_analysis(detailed_analysis))
 
             # --- Company Info and Key Metrics Side by Side ---
+            trace.section("render.company")
             col_info, col_metrics = st.columns([2, 2])
 
             with col_info:
@@ -251,30 +295,13 @@ if st.button("Analyze"):
                 st.table(metrics)
 
             # --- Stock Price History ---
+            trace.section("render.price_history")
             st.subheader("Stock Price History")
             st.markdown("12-month price movement with volume")
 
-            # Try to parse if it's a string
-            if isinstance(price_history, str):
-                try:
-                    price_history = json.loads(price_history)
-                except Exception:
-                    price_history = {}
-
-            # Now check if it's a dict with lists
-            if isinstance(price_history, dict) and price_history:
-                df_hist = pd.DataFrame(price_history)
-            else:
-                df_hist = pd.DataFrame()  # empty DataFrame
-
-            if not df_hist.empty and 'Date' in df_hist:
-                df_hist['Date'] = df_hist['Date'].astype(str)
-                df_hist['Date'] = pd.to_datetime(df_hist['Date'], errors='coerce', utc=True)
-                df_hist = df_hist.dropna(subset=['Date'])
-                df_hist = df_hist.sort_values('Date')
-                df_hist = df_hist.tail(12)
+            df_hist = dashboard.prepare_price_history(price_history)
+            if not df_hist.empty:
                 try:
-                    df_hist['Month'] = df_hist['Date'].dt.strftime('%b %Y')
                     fig = go.Figure()
                     fig.add_trace(go.Scatter(
                         x=df_hist['Month'], y=df_hist['Close'],
@@ -298,77 +325,36 @@ if st.button("Analyze"):
                 st.info("No price history data available.")
 
             # --- Quarterly Revenue & Profit and Company Information (Side by Side) ---
+            trace.section("render.quarterly_and_news")
             st.subheader("Quarterly Revenue & Profit")
             st.caption("Last 4 quarters financial performance")
             
             col_chart, col_news = st.columns([2, 2])
 
-            # Prepare quarterly data
-            if isinstance(quarterly, str):
-                try:
-                    quarterly = json.loads(quarterly)
-                except Exception:
-                    st.info(f"Could not parse quarterly financials. Received: {quarterly}")
-                    quarterly = {}
-
-            if isinstance(quarterly, dict) and quarterly:
-                df_quarterly = pd.DataFrame(quarterly)
-            else:
-                df_quarterly = pd.DataFrame()
+            chart = dashboard.quarterly_chart_data(quarterly)
 
             with col_chart:
-                if not df_quarterly.empty:
-                    # Use the last 4 columns (quarters)
-                    last_quarters = df_quarterly.columns[-4:]
-                    # Try to get revenue and profit rows
-                    revenue_row = None
-                    for key in ['Total Revenue', 'Normalized EBITDA', 'Revenue']:
-                        if key in df_quarterly.index:
-                            revenue_row = key
-                            break
-                    profit_row = None
-                    for key in ['Net Income', 'Net Income From Continuing Operation Net Minority Interest', 'Profit']:
-                        if key in df_quarterly.index:
-                            profit_row = key
-                            break
-                    if revenue_row and profit_row:
-                        # Prepare data for plotting
-                        quarters = [pd.to_datetime(q).strftime('%b %Y') for q in last_quarters]
-                        revenue = [df_quarterly.loc[revenue_row, q] / 1e9 if pd.notna(df_quarterly.loc[revenue_row, q]) else None for q in last_quarters]
-                        profit = [df_quarterly.loc[profit_row, q] / 1e9 if pd.notna(df_quarterly.loc[profit_row, q]) else None for q in last_quarters]
-                        # Only keep quarters where both revenue and profit are not None
-                        filtered = [(q, r, p) for q, r, p in zip(quarters, revenue, profit) if r is not None and p is not None]
-                        if not filtered:
-                            st.info("No valid revenue and profit data for the last four quarters.")
-                        else:
-                            fq, fr, fp = zip(*filtered)
-                            fig = go.Figure(data=[
-                                go.Bar(name='Revenue ($B)', x=fq, y=fr, marker_color='rgb(66,133,244)'),
-                                go.Bar(name='Profit ($B)', x=fq, y=fp, marker_color='rgb(52,168,83)')
-                            ])
-                            fig.update_layout(
-                                barmode='group',
-                                yaxis_title=None,
-                                xaxis_title=None,
-                                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                                margin=dict(l=20, r=20, t=40, b=20),
-                                height=300
-                            )
-                            st.plotly_chart(fig, use_container_width=True)
-                            # Warn if the latest quarter is missing data
-                            if None in (revenue[-1], profit[-1]):
-                                st.warning("Latest quarter data may be incomplete or missing.")
-                    else:
-                        st.info("Could not find revenue or profit data in quarterly financials.")
+                if "message" in chart:
+                    st.info(chart["message"])
                 else:
-                    st.info("No quarterly financial data available.")
+                    fig = go.Figure(data=[
+                        go.Bar(name='Revenue ($B)', x=chart["quarters"], y=chart["revenue"], marker_color='rgb(66,133,244)'),
+                        go.Bar(name='Profit ($B)', x=chart["quarters"], y=chart["profit"], marker_color='rgb(52,168,83)')
+                    ])
+                    fig.update_layout(
+                        barmode='group',
+                        yaxis_title=None,
+                        xaxis_title=None,
+                        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                        margin=dict(l=20, r=20, t=40, b=20),
+                        height=300
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+                    if chart["latest_incomplete"]:
+                        st.warning("Latest quarter data may be incomplete or missing.")
 
             with col_news:
-                def fetch_yf_news(symbol):
-                    stock = yf.Ticker(symbol)
-                    return stock.news[:15] if hasattr(stock, 'news') else []
-
-                news_articles = fetch_yf_news(symbol)
+                news_articles = bundle.get("news", [])
 
                 news_html = (
                     "<style>"
@@ -393,21 +379,16 @@ if st.button("Analyze"):
 
                 if news_articles:
                     for article in news_articles:
-                        content = article.get('content', {})
-                        title = content.get('title', 'No Title')
-                        link = (
-                            content.get('canonicalUrl', {}).get('url') or
-                            content.get('clickThroughUrl', {}).get('url') or
-                            '#'
-                        )
+                        title = article.get('title', 'No Title')
+                        link = article.get('link') or '#'
                         pub_time = ''
-                        if 'pubDate' in content:
+                        if article.get('published'):
                             try:
-                                pub_time = pd.to_datetime(content['pubDate']).strftime('%I:%M %p')
+                                pub_time = pd.to_datetime(article['published']).strftime('%I:%M %p')
                             except Exception:
-                                pub_time = pd.to_datetime(content['pubDate']).strftime('%b %d, %Y')
-                        publisher = content.get('provider', {}).get('displayName', '')
-                        summary = content.get('summary', '') or content.get('description', '')
+                                pub_time = ''
+                        publisher = article.get('publisher', '')
+                        summary = article.get('summary', '')
                         news_html += (
                             '<div class="news-item-block">'
                             f'<div class="news-item-time">{pub_time}</div>'
@@ -427,55 +408,13 @@ if st.button("Analyze"):
                 st.markdown(news_html, unsafe_allow_html=True)
 
             # --- Financial Statements ---
+            trace.section("render.statements")
             st.subheader("Financial Statements")
             tabs = st.tabs(["Income Statement", "Balance Sheet", "Cash Flow"])
 
-            # Fetch all financials
-            annual, balance, cashflow = asyncio.run(get_financials(symbol))
-
-            def build_fin_table(data, metrics, display_names):
-                years = []
-                rows = []
-                for i, key in enumerate(metrics):
-                    if key in data:
-                        values = data[key]
-                        # Skip if values is not a dict (could be a string or None)
-                        if not isinstance(values, dict):
-                            continue
-                        if not years:
-                            years = list(values.keys())
-                        row = [display_names[i]] + [values.get(year, None) for year in years]
-                        rows.append(row)
-                df = pd.DataFrame(rows, columns=["Metric"] + years)
-                # Only keep the last 3 years (most recent)
-                if len(years) > 3:
-                    last_years = sorted(years, reverse=True)[:3]
-                    last_years = sorted(last_years)  # ascending order
-                    df = df[["Metric"] + last_years]
-                else:
-                    last_years = years
-                # Format as billions
-                def format_billions(x):
-                    if pd.isna(x) or x is None:
-                        return ""
-                    return f"${x/1e9:.2f}"
-                for year in last_years:
-                    df[year] = df[year].apply(format_billions)
-                # Rename columns: if column looks like a date, use only the year
-                new_cols = ["Metric"] + [str(pd.to_datetime(col).year) if col != "Metric" else col for col in df.columns[1:]]
-                df.columns = ["Metric"] + new_cols[1:]
-                # Add YoY (%) column
-                def calc_yoy(row):
-                    try:
-                        vals = [float(str(row[year]).replace('$','').replace(',','')) for year in new_cols[1:]]
-                        if len(vals) >= 2 and vals[-2] != 0:
-                            pct = (vals[-1] - vals[-2]) / abs(vals[-2]) * 100
-                            return f"{pct:+.1f}%"
-                    except Exception:
-                        return ""
-                    return ""
-                df["YoY (%)"] = df.apply(calc_yoy, axis=1)
-                return df
+            annual = bundle.get("annual", {})
+            balance = bundle.get("balance_sheet", {})
+            cashflow = bundle.get("cash_flow", {})
 
             # Income Statement
             income_metrics = [
@@ -485,7 +424,7 @@ if st.button("Analyze"):
                 "Revenue", "Gross Profit", "Operating Income", "Net Income", "EPS (Diluted)"
             ]
             with tabs[0]:
-                df_income = build_fin_table(annual, income_metrics, income_names)
+                df_income = statements.fin_table(annual, income_metrics, income_names)
                 st.dataframe(df_income, use_container_width=True, hide_index=True)
 
             # Balance Sheet
@@ -496,7 +435,7 @@ if st.button("Analyze"):
                 "Total Assets", "Total Liabilities", "Shareholder Equity", "Cash & Equivalents", "Short Term Investments"
             ]
             with tabs[1]:
-                df_balance = build_fin_table(balance, balance_metrics, balance_names)
+                df_balance = statements.fin_table(balance, balance_metrics, balance_names)
                 st.dataframe(df_balance, use_container_width=True, hide_index=True)
 
             # Cash Flow
@@ -507,5 +446,52 @@ if st.button("Analyze"):
                 "Operating Cash Flow", "Capital Expenditures", "Free Cash Flow", "Investing Cash Flow", "Financing Cash Flow"
             ]
             with tabs[2]:
-                df_cash = build_fin_table(cashflow, cashflow_metrics, cashflow_names)
-                st.dataframe(df_cash, use_container_width=True, hide_index=True) 
\ No newline at end of file
+                df_cash = statements.fin_table(cashflow, cashflow_metrics, cashflow_names)
+                st.dataframe(df_cash, use_container_width=True, hide_index=True)
+
+            # --- MCP-based Recommendation ---
+            trace.section("recommendation")
+            if rec_events is not None:
+                # Render fragments as the model produces them, then the final result
+                fields, detailed_analysis = {}, ""
+                while True:
+                    try:
+                        kind, payload = rec_events.get(timeout=MCP_CALL_TIMEOUT)
+                    except queue.Empty:
+                        kind, payload = "error", "Timed out waiting for recommendation."
+                    if kind != "progress":
+                        break
+                    try:
+                        fragment = json.loads(payload)
+                    except Exception:
+                        continue
+                    fields.update(fragment.get("fields", {}))
+                    detailed_analysis += fragment.get("analysis", "")
+                    render_recommendation(
+                        fields.get("recommendation", "…"), fields.get("icon", "ℹ️"), fields.get("reason", ""), detailed_analysis
+                    )
+
+                rec_result = payload if kind == "result" else {"error": f"Could not get recommendation: {payload}"}
+            if isinstance(rec_result, str):
+                try:
+                    rec_result = json.loads(rec_result)
+                except Exception:
+                    st.error(f"Error: Could not parse recommendation result. Received: {rec_result}")
+                    st.stop()
+            if rec_result and not rec_result.get("error"):
+                if rec_events is not None:
+                    save_recommendation(symbol, rec_result)
+                rec = rec_result.get("recommendation", "N/A")
+                icon = rec_result.get("icon", "ℹ️")
+                reason = rec_result.get("reason", "")
+                detailed_analysis = rec_result.get("detailed_analysis", "")
+            else:
+                rec = 'N/A'
+                icon = 'ℹ️'
+                reason = rec_result.get("error", "Could not get recommendation.") if rec_result else "Could not get recommendation."
+                detailed_analysis = ""
+            render_recommendation(rec, icon, reason, detailed_analysis)
+
+            root = trace.finish()
+            if root.duration >= tracing.TRACE_SLOW_SECONDS:
+                show_waterfall(root)